@@ -0,0 +1,154 @@
+# agent_ga.py
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from deap import base, creator, tools
+import hashlib
+import os
+import random
+import numpy as np
+from config import config_editor
+import peremennue
+
+
+def agent_seed(race_seed, name):
+    """Derives a stable per-agent seed from the race seed and the agent name."""
+    digest = hashlib.sha256(f"{race_seed}:{name}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def register_creator_classes():
+    """Creates DEAP FitnessMin/Individual once per process (repeated creator.create overwrites them)."""
+    if not hasattr(creator, "FitnessMin"):
+        creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
+    if not hasattr(creator, "Individual"):
+        creator.create("Individual", list, fitness=creator.FitnessMin)
+
+
+def clone_individual(individual):
+    """toolbox.clone for flat pit-lap chromosomes: a list copy plus the fitness instead of deepcopy."""
+    # Конструкторы creator перебирают атрибуты класса на каждом вызове - объекты собираются напрямую
+    clone = list.__new__(creator.Individual)
+    clone.extend(individual)
+    clone.fitness = fitness = creator.FitnessMin.__new__(creator.FitnessMin)
+    fitness.wvalues = individual.fitness.wvalues
+    return clone
+
+
+class AgentGA:
+    """Represents a single racing agent using a genetic algorithm to find its strategy."""
+
+    def __init__(self, name, engine, random_seed=None):
+        self.name = name
+        self.engine = engine
+        self.final_position = None
+        self.random_seed = agent_seed(engine.random_seed, name) if random_seed is None else random_seed
+
+        self.LENGTH_CHROM = config_editor["REQUIRED_PIT_STOPS"]
+        self.POPULATION_SIZE = 50
+        self.P_CROSSOVER = 0.9
+        self.P_MUTATION = 0.2
+        self.MAX_GENERATIONS = 50
+
+        register_creator_classes()
+        self.toolbox = base.Toolbox()
+
+        def generate_pit_stops():
+            pit_stops = []
+            last_pit_lap = 0
+            for _ in range(self.LENGTH_CHROM):
+                min_lap = last_pit_lap + config_editor["MIN_STINT_LENGTH"]
+                max_lap = config_editor["TOTAL_LAPS"] - (self.LENGTH_CHROM - len(pit_stops) - 1) * config_editor[
+                    "MIN_STINT_LENGTH"]
+                if min_lap >= max_lap:
+                    pit_stops.append(max_lap)
+                else:
+                    pit_stops.append(random.randint(min_lap, max_lap))
+                last_pit_lap = pit_stops[-1]
+            pit_stops.sort()
+            return pit_stops
+
+        self.toolbox.register("individualCreator", tools.initIterate, creator.Individual, generate_pit_stops)
+        self.toolbox.register("clone", clone_individual)
+        self.toolbox.register("populationCreator", tools.initRepeat, list, self.toolbox.individualCreator)
+        self.toolbox.register("evaluate", self.evaluate_strategy)
+        self.toolbox.register("select", tools.selTournament, tournsize=3)
+        self.toolbox.register("mate", tools.cxTwoPoint)
+
+        def custom_mutate(individual, indpb):
+            for i in range(len(individual)):
+                if random.random() < indpb:
+                    last_pit_lap = individual[i - 1] if i > 0 else 0
+                    next_pit_lap = individual[i + 1] if i < len(individual) - 1 else config_editor["TOTAL_LAPS"]
+                    min_lap = last_pit_lap + config_editor["MIN_STINT_LENGTH"]
+                    max_lap = next_pit_lap - config_editor["MIN_STINT_LENGTH"]
+                    if min_lap < max_lap:
+                        individual[i] = random.randint(min_lap, max_lap)
+            individual.sort()
+            return individual,
+
+        self.toolbox.register("mutate", custom_mutate, indpb=1.0 / self.LENGTH_CHROM)
+
+    def evaluate_strategy(self, individual):
+        return random.uniform(90 * config_editor["TOTAL_LAPS"], 110 * config_editor["TOTAL_LAPS"]),
+
+    def find_best_strategy(self):
+        # DEAP-операторы берут числа из модуля random, поэтому на время поиска глобальный генератор
+        # пересевается семенем агента, а затем восстанавливается
+        outer_state = random.getstate()
+        random.seed(self.random_seed)
+        try:
+            return self._evolve()
+        finally:
+            random.setstate(outer_state)
+
+    def _evolve(self):
+        population = self.toolbox.populationCreator(n=self.POPULATION_SIZE)
+
+        for gen in range(self.MAX_GENERATIONS):
+            offspring = self.toolbox.select(population, len(population))
+            offspring = list(map(self.toolbox.clone, offspring))
+
+            for child1, child2 in zip(offspring[::2], offspring[1::2]):
+                if random.random() < self.P_CROSSOVER:
+                    self.toolbox.mate(child1, child2)
+                    child1.sort()
+                    child2.sort()
+                    del child1.fitness.values
+                    del child2.fitness.values
+
+            for mutant in offspring:
+                if random.random() < self.P_MUTATION:
+                    self.toolbox.mutate(mutant)
+                    del mutant.fitness.values
+
+            invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
+            fitnesses = self.toolbox.map(self.toolbox.evaluate, invalid_ind)
+            for ind, fit in zip(invalid_ind, fitnesses):
+                ind.fitness.values = fit
+
+            population[:] = offspring
+
+        best_individual = tools.selBest(population, 1)[0]
+        return best_individual
+
+
+def _find_agent_strategy(name, engine):
+    agent = AgentGA(name, engine)
+    return name, list(agent.find_best_strategy())
+
+
+def iter_agent_strategies(car_names, engine, workers=None):
+    """Runs every agent's GA in a process pool and yields (name, strategy) as each one finishes.
+
+    Each agent draws from its own seed (see agent_seed), so the strategies do not depend on the
+    number of workers or on the completion order.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(car_names))
+    if workers <= 1:
+        for name in car_names:
+            yield _find_agent_strategy(name, engine)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_find_agent_strategy, name, engine) for name in car_names]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,324 @@
+# benchmark.py
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from agent_ga import AgentGA
+from config import config_editor
+from profiling import PhaseProfiler
+from race_controller import RaceController
+from race_engine import ColumnarRaceEngine, RaceEngine
+from race_model import INITIAL_STATE, RaceModel
+
+BASELINE_FILE = "benchmark_baseline.json"
+# Допустимое ухудшение основной метрики относительно базовой линии
+REGRESSION_THRESHOLD = 0.2
+BENCHMARK_SEED = 12345
+
+CAR_COUNTS = (10, 50, 200)
+LAP_COUNTS = (150, 1000)
+GA_SIZES = (100, 500)
+GA_GENERATIONS = 10
+SIMULATION_COUNT = 200
+WEATHER_COUNT = 50
+# Средняя длина отрезка стратегий нагрузок: с разбросом до 11 кругов, меньше пробега Soft до перегрева
+# (12 кругов), поэтому стратегии доезжают до финиша на любой длине гонки
+STINT_LAPS = 8
+PIT_LAP_JITTER = 1
+
+# Основная метрика каждого вида нагрузки и направление "лучше": +1 больше, -1 меньше
+PRIMARY_METRICS = {
+    'engine': ('laps_per_sec', 1),
+    'model': ('sims_per_sec', 1),
+    'weather': ('sims_per_sec', 1),
+    'ga': ('gen_latency_ms', -1),
+}
+
+
+def pit_stops_for(total_laps):
+    """Required pit stops of a benchmark race: one per STINT_LAPS laps, so the benchmark strategies finish."""
+    return total_laps // STINT_LAPS - 1
+
+
+@contextlib.contextmanager
+def race_config(total_laps):
+    """Temporarily sets TOTAL_LAPS and REQUIRED_PIT_STOPS in config_editor (read on construction)."""
+    saved = dict(config_editor)
+    config_editor["REQUIRED_PIT_STOPS"] = pit_stops_for(total_laps)
+    config_editor["TOTAL_LAPS"] = total_laps
+    try:
+        yield
+    finally:
+        config_editor.update(saved)
+
+
+def benchmark_strategies(n, total_laps, seed=BENCHMARK_SEED):
+    """n strategies with evenly spaced pit stops jittered by up to PIT_LAP_JITTER laps with a fixed seed."""
+    rng = random.Random(seed)
+    n_stops = pit_stops_for(total_laps)
+    spacing = total_laps / (n_stops + 1)
+    return [sorted(min(total_laps - 1, max(1, round((j + 1) * spacing) + rng.randint(-PIT_LAP_JITTER,
+                                                                                         PIT_LAP_JITTER)))
+                   for j in range(n_stops)) for _ in range(n)]
+
+
+def model_laps_completed(model, strategies):
+    """Laps RaceModel actually simulates for the strategies (a retirement ends the simulation)."""
+    return sum(model._simulate_laps(sorted(strategy), INITIAL_STATE, collect_laps=False)[0][2]
+               for strategy in strategies)
+
+
+def engine_laps_completed(engine):
+    """Laps the cars of a finished race actually drove (a retired car stops on its DNF lap)."""
+    return sum(car.dnf_lap - 1 if car.is_dnf else engine.TOTAL_LAPS for car in engine.cars)
+
+
+def engine_workload(engine_class, n_cars, total_laps):
+    def setup():
+        with race_config(total_laps):
+            names = [f"Agent-{i + 1}" for i in range(n_cars)]
+            engine = engine_class(names, random_seed=BENCHMARK_SEED)
+        for name, strategy in zip(names, benchmark_strategies(n_cars, total_laps)):
+            engine.set_strategy(name, strategy)
+
+        def run():
+            if isinstance(engine, ColumnarRaceEngine):
+                engine.run_race_to_array()
+            else:
+                engine.run_race_lap_by_lap()
+            return {'laps': engine_laps_completed(engine), 'sims': 1}
+        return run
+    return setup
+
+
+def model_workload(batch, total_laps):
+    def setup():
+        with race_config(total_laps):
+            model = RaceModel(BENCHMARK_SEED, cache_size=0)
+        strategies = benchmark_strategies(SIMULATION_COUNT, total_laps)
+        laps = model_laps_completed(model, strategies)
+
+        def run():
+            if batch:
+                model.evaluate_population(strategies)
+            else:
+                for strategy in strategies:
+                    model._run_simulation(strategy, collect_laps=False)
+            return {'laps': laps, 'sims': SIMULATION_COUNT}
+        return run
+    return setup
+
+
+def weather_workload(total_laps):
+    def setup():
+        with race_config(total_laps):
+            model = RaceModel(BENCHMARK_SEED, cache_size=0)
+
+        def run():
+            random.seed(BENCHMARK_SEED)
+            for _ in range(WEATHER_COUNT):
+                model.generate_weather_sequence()
+            return {'laps': WEATHER_COUNT * total_laps, 'sims': WEATHER_COUNT}
+        return run
+    return setup
+
+
+def controller_workload(population_size, total_laps, generations=GA_GENERATIONS, profiler=None):
+    def setup():
+        with race_config(total_laps):
+            model = RaceModel(BENCHMARK_SEED)
+        controller = RaceController(model)
+        controller.POPULATION_SIZE = population_size
+        controller.MAX_GENERATIONS = generations
+        # Начальная популяция из доезжающих стратегий, иначе почти все особи сходят в первых отрезках
+        strategies = benchmark_strategies(population_size, total_laps)
+        controller.toolbox.register("genesCreator", lambda n: np.array(strategies[:n], dtype=np.int64))
+
+        def run():
+            attached = profiler.attach(controller=controller, model=model) if profiler else contextlib.nullcontext()
+            with attached, contextlib.redirect_stdout(io.StringIO()):
+                _, logbook = controller.run_ga_with_elitism()
+            return {'generations': len(logbook), 'sims': sum(logbook.select('nevals'))}
+        return run
+    return setup
+
+
+def agent_workload(profiler=None):
+    def setup():
+        engine = RaceEngine(["Agent-1"], random_seed=BENCHMARK_SEED)
+        agent = AgentGA("Agent-1", engine)
+
+        def run():
+            attached = profiler.attach(agent=agent) if profiler else contextlib.nullcontext()
+            with attached:
+                agent.find_best_strategy()
+            return {'generations': agent.MAX_GENERATIONS,
+                    'sims': agent.MAX_GENERATIONS * agent.POPULATION_SIZE}
+        return run
+    return setup
+
+
+def workloads(quick=False):
+    """Fixed-seed workloads: {name: (kind, setup)}; quick keeps the smallest size of every kind."""
+    car_counts = CAR_COUNTS[:1] if quick else CAR_COUNTS
+    lap_counts = LAP_COUNTS[:1] if quick else LAP_COUNTS
+    ga_sizes = GA_SIZES[:1] if quick else GA_SIZES
+
+    suite = {}
+    for total_laps in lap_counts:
+        for n_cars in car_counts:
+            suite[f"engine.columnar.cars{n_cars}.laps{total_laps}"] = (
+                'engine', engine_workload(ColumnarRaceEngine, n_cars, total_laps))
+            suite[f"engine.legacy.cars{n_cars}.laps{total_laps}"] = (
+                'engine', engine_workload(RaceEngine, n_cars, total_laps))
+        suite[f"model.scalar.laps{total_laps}"] = ('model', model_workload(False, total_laps))
+        suite[f"model.batch.laps{total_laps}"] = ('model', model_workload(True, total_laps))
+        suite[f"weather.laps{total_laps}"] = ('weather', weather_workload(total_laps))
+    for population_size in ga_sizes:
+        suite[f"ga.controller.pop{population_size}.laps150"] = ('ga', controller_workload(population_size, 150))
+    suite["ga.controller.pop100.laps1000"] = ('ga', controller_workload(100, 1000))
+    suite["ga.agent.pop50"] = ('ga', agent_workload())
+    return suite
+
+
+def measure(setup, repeats):
+    """Best-of-`repeats` wall time, then one more run under tracemalloc for memory and allocations."""
+    best, work = float('inf'), None
+    for _ in range(repeats):
+        run = setup()
+        gc.collect()
+        start = time.perf_counter()
+        work = run()
+        best = min(best, time.perf_counter() - start)
+
+    run = setup()
+    gc.collect()
+    collections = gc.get_stats()[0]['collections']
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    metrics = {
+        'seconds': best,
+        'peak_mb': peak / 2 ** 20,
+        # Сборки поколения 0 запускаются каждые ~700 созданных объектов - грубый счётчик выделений
+        'gc_gen0': gc.get_stats()[0]['collections'] - collections,
+        'net_blocks': sys.getallocatedblocks() - blocks,
+    }
+    if 'laps' in work:
+        metrics['laps_per_sec'] = work['laps'] / best
+    if 'sims' in work:
+        metrics['sims_per_sec'] = work['sims'] / best
+    if 'generations' in work:
+        metrics['gen_latency_ms'] = best / work['generations'] * 1000
+    return metrics
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Lines describing every primary metric or peak memory that is worse than baseline by over threshold."""
+    regressions = []
+    for name, (kind, metrics) in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        metric, direction = PRIMARY_METRICS[kind]
+        for key, better in ((metric, direction), ('peak_mb', -1)):
+            if key not in reference or not reference[key]:
+                continue
+            change = (metrics[key] - reference[key]) / reference[key] * better
+            if change < -threshold:
+                regressions.append(f"{name}: {key} {metrics[key]:.4g} против {reference[key]:.4g} "
+                                   f"({change:+.0%})")
+    return regressions
+
+
+def format_results(results, baseline):
+    lines = [f"{'Нагрузка':<34}{'сек':>9}{'сим/с':>11}{'кругов/с':>12}{'мс/покол.':>11}"
+             f"{'пик, МБ':>9}{'gc0':>7}{'к базе':>9}"]
+    for name, (kind, metrics) in results.items():
+        metric, direction = PRIMARY_METRICS[kind]
+        reference = baseline.get(name, {}).get(metric)
+        change = f"{(metrics[metric] - reference) / reference * direction:+.0%}" if reference else "-"
+        lines.append(f"{name:<34}{metrics['seconds']:>9.4f}{metrics.get('sims_per_sec', 0):>11.0f}"
+                     f"{metrics.get('laps_per_sec', 0):>12.0f}{metrics.get('gen_latency_ms', 0):>11.2f}"
+                     f"{metrics['peak_mb']:>9.2f}{metrics['gc_gen0']:>7}{change:>9}")
+    return '\n'.join(lines)
+
+
+def run_benchmarks(quick=False, repeats=3, pattern=None):
+    results = {}
+    for name, (kind, setup) in workloads(quick).items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = (kind, measure(setup, repeats))
+        print(f"  {name}: {results[name][1]['seconds']:.4f} сек", file=sys.stderr)
+    return results
+
+
+def profile_production(cprofile_path=None):
+    """Phase breakdown of a RaceController run, an AgentGA search and a 10-car race under PhaseProfiler."""
+    profiler = PhaseProfiler(cprofile_path)
+    controller_workload(GA_SIZES[-1], 150, generations=80, profiler=profiler)()()
+    agent_workload(profiler)()()
+
+    engine = ColumnarRaceEngine([f"Agent-{i + 1}" for i in range(10)], random_seed=BENCHMARK_SEED)
+    for car, strategy in zip(engine.cars, benchmark_strategies(10, engine.TOTAL_LAPS)):
+        engine.set_strategy(car.name, strategy)
+    with profiler.attach(engine=engine):
+        engine.run_race_lap_by_lap()
+    return profiler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности симулятора и оптимизаторов")
+    parser.add_argument("--quick", action="store_true", help="только наименьшие размеры каждой нагрузки")
+    parser.add_argument("--repeats", type=int, default=3, help="повторов на нагрузку (берётся лучшее время)")
+    parser.add_argument("-k", dest="pattern", default=None, help="только нагрузки, в имени которых есть строка")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="файл базовой линии JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовую линию")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="допустимое ухудшение относительно базовой линии (0.2 = 20%%)")
+    parser.add_argument("--profile", action="store_true",
+                        help="разбивка времени по фазам (отбор, вариация, оценка, обновление круга)")
+    parser.add_argument("--cprofile", default=None, metavar="PATH", help="сохранить cProfile профиль в PATH")
+    args = parser.parse_args()
+
+    if args.profile or args.cprofile:
+        print(profile_production(args.cprofile).format_report())
+        raise SystemExit
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results = run_benchmarks(args.quick, args.repeats, args.pattern)
+    print(format_results(results, baseline))
+
+    if args.save_baseline:
+        saved = {'numpy': np.__version__, 'python': sys.version.split()[0],
+                 'results': {**baseline, **{name: metrics for name, (_, metrics) in results.items()}}}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, indent=4)
+        print(f"\nБазовая линия сохранена в {args.baseline}.")
+    elif baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ Регрессии больше {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\n✅ Регрессий больше {args.threshold:.0%} нет.")
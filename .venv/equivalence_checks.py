@@ -0,0 +1,134 @@
+# equivalence_checks.py
+import argparse
+import itertools
+import random
+
+import numpy as np
+
+from race_model import RaceModel
+from strategy_solver import StrategySolver
+
+DEFAULT_SEEDS = (1, 2, 3)
+RANDOM_CHROMOSOMES = 200
+VALID_CHROMOSOMES = 100
+# Размер пачки перебора всех допустимых стратегий в проверке DP
+BRUTE_FORCE_CHUNK = 20000
+# Допуск сравнения сумм с плавающей точкой, посчитанных в разном порядке, сек
+TIME_TOLERANCE = 1e-6
+
+
+def check_population(model, seed):
+    """Fixed-seed chromosomes: arbitrary gene values (duplicates, out-of-range laps) and valid sorted stops."""
+    rng = random.Random(seed)
+    n_stops = model.REQUIRED_PIT_STOPS
+    population = [[rng.randint(-2, model.TOTAL_LAPS + 5) for _ in range(n_stops)]
+                  for _ in range(RANDOM_CHROMOSOMES)]
+    population += [sorted(rng.sample(range(1, model.TOTAL_LAPS + 1), n_stops)) for _ in range(VALID_CHROMOSOMES)]
+    return population
+
+
+def check_batch(seed):
+    """RaceModel.evaluate_population on shared lap-time draws equals _run_simulation for every chromosome."""
+    model = RaceModel(seed, cache_size=0)
+    population = check_population(model, seed)
+    lap_times = np.random.default_rng(seed).uniform(90, 99, size=(len(population), model.TOTAL_LAPS))
+
+    batch = model.evaluate_population(population, lap_times=lap_times)
+    mismatches = []
+    for individual, row, batch_time in zip(population, lap_times, batch):
+        total_time, _, _, _ = model._run_simulation(individual, lap_times=row, collect_laps=False)
+        if total_time != batch_time:
+            mismatches.append(f"{individual}: пакетно {batch_time!r}, поштучно {total_time!r}")
+    return mismatches
+
+
+def check_incremental(seed):
+    """evaluate_incremental equals a full _run_simulation, cold and resumed from checkpoints in either order."""
+    model = RaceModel(seed, cache_size=0)
+    population = check_population(model, seed)
+    # Потомки с общим префиксом пит-стопов: только они и досимулируются от контрольных точек
+    rng = random.Random(seed)
+    population += [individual[:-1] + [rng.randint(individual[-1], model.TOTAL_LAPS)]
+                   for individual in population[RANDOM_CHROMOSOMES:]]
+    lap_times = np.random.default_rng(seed).uniform(90, 99, size=model.TOTAL_LAPS)
+
+    forward = model.evaluate_incremental(population, lap_times=lap_times)
+    backward = model.evaluate_incremental(population[::-1], lap_times=lap_times)[::-1]
+    mismatches = []
+    for individual, forward_time, backward_time in zip(population, forward, backward):
+        total_time, _, _, _ = model._run_simulation(individual, lap_times=lap_times, collect_laps=False)
+        if total_time != forward_time or total_time != backward_time:
+            mismatches.append(f"{individual}: инкрементально {forward_time!r} / {backward_time!r}, "
+                              f"полностью {total_time!r}")
+    if not model.checkpoints.stats()['laps_skipped']:
+        mismatches.append("ни одна оценка не продолжилась от контрольной точки")
+    return mismatches
+
+
+def feasible_strategies(model):
+    """Every sorted pit-lap chromosome the DP solver searches: stints of at least MIN_STINT_LENGTH laps."""
+    n_stops, min_stint = model.REQUIRED_PIT_STOPS, model.MIN_STINT_LENGTH
+    laps = range(min_stint, model.TOTAL_LAPS - min_stint + 1)
+    return np.array([stops for stops in itertools.combinations(laps, n_stops)
+                     if all(b - a >= min_stint for a, b in zip(stops, stops[1:]))])
+
+
+def check_dp(seed):
+    """StrategySolver's optimum equals its simulated expected time and the brute-force minimum over all strategies."""
+    model = RaceModel(seed, cache_size=0)
+    solver = StrategySolver(model)
+    strategy, expected_time = solver.solve()
+
+    mismatches = []
+    simulated = float(solver.expected_race_time(strategy))
+    if abs(simulated - expected_time) > TIME_TOLERANCE:
+        mismatches.append(f"{strategy}: DP {expected_time!r}, симуляция {simulated!r}")
+
+    best_time, best_strategy = np.inf, None
+    candidates = feasible_strategies(model)
+    for start in range(0, len(candidates), BRUTE_FORCE_CHUNK):
+        chunk = candidates[start:start + BRUTE_FORCE_CHUNK]
+        lap_times = np.full((len(chunk), model.TOTAL_LAPS), solver.EXPECTED_LAP_TIME)
+        total_time, _, _ = model._simulate_population(chunk, lap_times)
+        i = int(total_time.argmin())
+        if total_time[i] < best_time:
+            best_time, best_strategy = float(total_time[i]), chunk[i].tolist()
+    if abs(expected_time - best_time) > TIME_TOLERANCE:
+        mismatches.append(f"DP {strategy} = {expected_time!r}, перебор {best_strategy} = {best_time!r}")
+    return mismatches
+
+
+CHECKS = {
+    'batch': check_batch,
+    'incremental': check_incremental,
+    'dp': check_dp,
+}
+
+
+def run_checks(seeds=DEFAULT_SEEDS, names=None):
+    """Runs the checks on every seed; returns {check name: [mismatch descriptions]}."""
+    results = {}
+    for name, check in CHECKS.items():
+        if names and name not in names:
+            continue
+        results[name] = [f"сид {seed}: {mismatch}" for seed in seeds for mismatch in check(seed)]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверки совпадения быстрых оценок с RaceModel._run_simulation")
+    parser.add_argument("--seeds", type=int, nargs="+", default=list(DEFAULT_SEEDS), help="сиды гонок")
+    parser.add_argument("--only", action="append", choices=list(CHECKS), help="только указанная проверка")
+    args = parser.parse_args()
+
+    failed = False
+    for name, mismatches in run_checks(args.seeds, args.only).items():
+        if mismatches:
+            failed = True
+            print(f"❌ {name}: расхождений {len(mismatches)}")
+            for line in mismatches[:10]:
+                print(f"  {line}")
+        else:
+            print(f"✅ {name}: совпадает на сидах {args.seeds}")
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,124 @@
+# fitness_cache.py
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+
+
+class FitnessCache:
+    """Bounded LRU cache of strategy fitness values keyed by chromosome, weather and seed.
+
+    `fingerprint` identifies the simulation parameters the values were computed with; it is saved with
+    the entries and load() ignores files written under a different fingerprint or key format.
+    """
+
+    # Версия формата ключей (make_keys): файлы со старыми ключами не загружаются
+    KEY_FORMAT = 2
+
+    def __init__(self, max_size=100000, fingerprint=None):
+        self.max_size = max_size
+        self.fingerprint = fingerprint
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def weather_key(weather):
+        # Стабильный между запусками отпечаток (hash() строк рандомизирован в каждом процессе)
+        return hashlib.sha1(' '.join(weather).encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def config_fingerprint(*parts):
+        """Stable digest of the race parameters and tables (their repr) behind the cached values."""
+        return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def make_keys(pit_stop_laps, weather_key, seed):
+        """Keys of the rows of a sorted (individuals, genes) pit-lap array: bytes of a context digest and the row."""
+        pit_stop_laps = np.asarray(pit_stop_laps, dtype=np.int64)
+        rows = np.empty((len(pit_stop_laps), pit_stop_laps.shape[1] + 1), dtype=np.int64)
+        # Погода и сид входят в ключ 64-битным отпечатком в первом столбце
+        rows[:, 0] = int.from_bytes(hashlib.sha1(f"{weather_key}:{seed}".encode('utf-8')).digest()[:8], 'little',
+                                    signed=True)
+        rows[:, 1:] = pit_stop_laps
+        return rows.view(np.dtype((np.void, rows.shape[1] * rows.itemsize))).ravel().tolist()
+
+    @staticmethod
+    def make_key(individual, weather_key, seed):
+        return FitnessCache.make_keys([sorted(individual)], weather_key, seed)[0]
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, keys):
+        """get() of every key: a list of the values with None for misses."""
+        values = list(map(self.entries.get, keys))
+        found = [key for key, value in zip(keys, values) if value is not None]
+        for key in found:
+            self.entries.move_to_end(key)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return values
+
+    def put_many(self, keys, values):
+        """put() of every (key, value) pair."""
+        # Новые ключи и так встают в конец, переставлять нужно только уже известные
+        known = [key for key in keys if key in self.entries]
+        self.entries.update(zip(keys, values))
+        for key in known:
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+        }
+
+    def save(self, path):
+        """Writes the cache entries to disk (most recently used last)."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'fingerprint': self.fingerprint, 'key_format': self.KEY_FORMAT,
+                         'entries': list(self.entries.items())}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """Loads entries saved by save(); a missing, broken or stale file leaves the cache empty.
+
+        Returns True if the entries were loaded.
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, OSError):
+            return False
+        # Файлы без отпечатка или с другим отпечатком посчитаны при других параметрах гонки
+        if (not isinstance(saved, dict) or saved.get('fingerprint') != self.fingerprint
+                or saved.get('key_format') != self.KEY_FORMAT):
+            return False
+        for key, value in saved['entries'][-self.max_size:]:
+            self.entries[key] = value
+        return True
@@ -0,0 +1,301 @@
+# island_ga.py
+import copy
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from deap import tools
+
+from agent_ga import agent_seed
+from race_controller import (ConvergenceMonitor, RaceController, gene_moments, individuals_from_arrays,
+                             population_diversity)
+
+MIGRATION_TOPOLOGIES = ('ring', 'complete')
+# Столбцы счётчиков модели (кэш, контрольные точки), которые суммируются по островам
+MODEL_COUNTERS = ('hits', 'misses', 'evictions', 'laps_sim', 'laps_skip')
+
+# Функция оценки процесса-оценщика внутри острова (см. _init_evaluator)
+_evaluate = None
+
+
+def _init_evaluator(model, evaluate, seed):
+    global _evaluate
+    # evaluate привязана к model: обе приходят одним пакетом, поэтому это одна и та же копия модели
+    _evaluate = evaluate
+    # Свой поток времён кругов у каждого процесса-оценщика
+    model.rng = np.random.default_rng([seed, multiprocessing.current_process().pid])
+
+
+def _evaluate_chunk(individuals):
+    return _evaluate(individuals)
+
+
+def migration_sources(topology, n_islands):
+    """Source islands of every island: 'ring' (i - 1 -> i), 'complete' or a list of (source, target) edges."""
+    if topology == 'ring':
+        return [[(i - 1) % n_islands] if n_islands > 1 else [] for i in range(n_islands)]
+    if topology == 'complete':
+        return [[j for j in range(n_islands) if j != i] for i in range(n_islands)]
+    if isinstance(topology, str):
+        raise ValueError(f"Unknown migration topology {topology!r}, expected one of {MIGRATION_TOPOLOGIES} "
+                         f"or a list of (source, target) edges")
+    sources = [[] for _ in range(n_islands)]
+    for source, target in topology:
+        sources[target].append(source)
+    return sources
+
+
+class Island:
+    """One sub-population of the island model with its own RaceController, model copy and random streams."""
+
+    def __init__(self, model, controller_kwargs, settings, seed, population_size, eval_workers=None):
+        self.controller = RaceController(model, **controller_kwargs)
+        for name, value in settings.items():
+            setattr(self.controller, name, value)
+        self.population_size = population_size
+        # Популяция острова хранится массивами генов и фитнеса, особи собираются только для миграции
+        self.genes, self.fitness = None, None
+
+        model.rng = np.random.default_rng(seed)
+        outer_state = random.getstate()
+        random.seed(seed)
+        self.random_state = random.getstate()
+        random.setstate(outer_state)
+
+        self.executor = None
+        if eval_workers and eval_workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=eval_workers, initializer=_init_evaluator,
+                                                initargs=(model, self.controller.toolbox.evaluate_population, seed))
+            self.controller.toolbox.register("map", self.executor.map)
+            self.controller.toolbox.register("evaluate_population", _evaluate_chunk)
+            if not self.controller.EVAL_CHUNK_SIZE:
+                self.controller.EVAL_CHUNK_SIZE = max(1, -(-population_size // eval_workers))
+
+    def _run(self, step):
+        # DEAP-операторы берут числа из модуля random: у каждого острова свой поток
+        outer_state = random.getstate()
+        random.setstate(self.random_state)
+        try:
+            return step()
+        finally:
+            self.random_state = random.getstate()
+            random.setstate(outer_state)
+
+    def _record(self, nevals):
+        record = self.controller.arrays_record(self.genes, self.fitness, nevals)
+        if self.executor is not None:
+            # Оценки идут в копиях модели процессов-оценщиков: их счётчики сюда не возвращаются
+            record = {name: value for name, value in record.items() if name not in MODEL_COUNTERS}
+        return record, gene_moments(self.genes)
+
+    def start(self):
+        """Creates and evaluates the initial population; returns [(record, moments)] of generation 0."""
+        def step():
+            self.controller.reset_counters()
+            self.genes, self.fitness, nevals = self.controller.init_population_arrays(self.population_size)
+            return [self._record(nevals)]
+
+        return self._run(step)
+
+    def evolve(self, immigrants, generations):
+        """Replaces the worst individuals with immigrants and runs `generations` generations.
+
+        Returns (records, emigrants, best individual).
+        """
+        def step():
+            if immigrants:
+                # Как tools.selWorst: худшие (наибольшее время) при равенстве в порядке популяции,
+                # прибывшие встают на их места по порядку позиций
+                positions = np.sort(np.argsort(-self.fitness, kind='stable')[:len(immigrants)])
+                self.genes[positions] = np.array(immigrants, dtype=np.int64).reshape(len(immigrants), -1)
+                self.fitness[positions] = [ind.fitness.values[0] for ind in immigrants]
+                self.controller.update_hall_of_fame(self.genes, self.fitness)
+
+            records = []
+            for _ in range(generations):
+                self.genes, self.fitness, nevals = self.controller.next_generation_arrays(self.genes, self.fitness)
+                records.append(self._record(nevals))
+
+            # Как tools.selBest: лучшие при равенстве в порядке популяции
+            best = np.argsort(self.fitness, kind='stable')[:self.controller.MIGRATION_SIZE]
+            emigrants = individuals_from_arrays(self.genes[best], self.fitness[best])
+            return records, emigrants, self.controller.toolbox.clone(self.controller.hof.items[0])
+
+        return self._run(step)
+
+    def cache_entries(self):
+        """(key, value) entries of the island model's fitness cache, empty without a cache."""
+        cache = self.controller.model.cache
+        return list(cache.entries.items()) if cache is not None else []
+
+    def close(self):
+        """Shuts down the evaluation pool; returns cache_entries() for the main model (see run_islands)."""
+        if self.executor is not None:
+            self.executor.shutdown()
+        return self.cache_entries()
+
+
+def _island_worker(conn, *island_args):
+    island = Island(*island_args)
+    try:
+        conn.send(island.start())
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            conn.send(island.evolve(*message))
+        # Файл кэша пишет только основной процесс: записи острова уходят ему
+        conn.send(island.cache_entries())
+    finally:
+        island.close()
+        conn.close()
+
+
+class _IslandProcess:
+    """Island running in its own process; the same start/evolve interface as Island over a pipe."""
+
+    def __init__(self, *island_args):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_island_worker, args=(child_conn,) + island_args)
+        self.process.start()
+        child_conn.close()
+
+    def start(self):
+        return self.conn.recv()
+
+    def submit(self, immigrants, generations):
+        self.conn.send((immigrants, generations))
+
+    def result(self):
+        return self.conn.recv()
+
+    def close(self):
+        """Stops the island process; returns its cache entries (empty if the process has failed)."""
+        entries = []
+        try:
+            self.conn.send(None)
+            entries = self.conn.recv()
+        except (OSError, EOFError):
+            pass  # процесс острова уже завершился с ошибкой
+        # Закрытый канал не даст процессу острова зависнуть на отправке, если ответ не дочитан
+        self.conn.close()
+        self.process.join()
+        return entries
+
+
+def _combine_records(island_records):
+    """Global logbook record of one generation from the (record, moments) pairs of all islands."""
+    records = [record for record, _ in island_records]
+    means = np.array([moments[0] for _, moments in island_records])
+    variances = np.array([moments[1] for _, moments in island_records])
+    # Острова одного размера: дисперсия объединения = средняя дисперсия + дисперсия средних
+    pooled = variances.mean(axis=0) + means.var(axis=0)
+
+    combined = {'nevals': sum(record['nevals'] for record in records)}
+    if 'min' in records[0]:
+        combined['min'] = min(record['min'] for record in records)
+    if 'avg' in records[0]:
+        combined['avg'] = float(np.mean([record['avg'] for record in records]))
+    combined['div'] = population_diversity(moments=(None, pooled))
+    for name in MODEL_COUNTERS:
+        if name in records[0]:
+            combined[name] = sum(record[name] for record in records)
+    return combined
+
+
+def run_islands(controller, processes=True, eval_workers=None):
+    """Runs controller's GA as N_ISLANDS sub-populations that exchange their best individuals.
+
+    Every MIGRATION_INTERVAL generations each island sends its MIGRATION_SIZE best individuals along
+    MIGRATION_TOPOLOGY and replaces its worst ones with the best of the arrivals. Islands run in separate
+    processes (processes=False runs them one after another in this process with identical results), and
+    eval_workers > 1 gives every island a process pool for toolbox.map; its workers draw their own lap times,
+    so that mode is not reproducible run to run, and evaluate with their own model copies: the cache and
+    checkpoint counters are left out of the logbook and the workers' cache entries are not saved.
+    The entries of every island's own cache are merged into controller.model.cache, which is saved once
+    to its cache_path at the end of the run (islands never write the cache file themselves).
+    The logbook keeps the columns of run_ga_with_elitism for the whole archipelago plus one chapter of
+    per-island stats per island. With EARLY_STOPPING_GENERATIONS set, islands evolve one generation per
+    message, so the run stops at the same generation as run_ga_with_elitism would record it.
+    Returns (best individual, logbook).
+    """
+    n_islands = controller.N_ISLANDS
+    sources = migration_sources(controller.MIGRATION_TOPOLOGY, n_islands)
+    population_size = max(controller.POPULATION_SIZE // n_islands, controller.HALL_OF_FAME_SIZE + 2)
+    settings = {name: value for name, value in vars(controller).items() if name.isupper()}
+    controller_kwargs = {'scenarios': controller.scenarios, 'risk': controller.risk, 'alpha': controller.alpha,
+                         'incremental': controller.incremental}
+
+    islands = []
+    for i in range(n_islands):
+        seed = agent_seed(controller.model.random_seed, f"island-{i}")
+        # Процесс острова получает свою копию модели сам, в том же процессе она копируется явно
+        model = controller.model if processes else copy.deepcopy(controller.model)
+        island_args = (model, controller_kwargs, settings, seed, population_size,
+                       eval_workers)
+        islands.append(_IslandProcess(*island_args) if processes else Island(*island_args))
+
+    logbook = tools.Logbook()
+    logbook.header = controller.logbook_header()
+    if eval_workers and eval_workers > 1:
+        logbook.header = [name for name in logbook.header if name not in MODEL_COUNTERS]
+    island_names = [f"island-{i}" for i in range(n_islands)]
+    monitor = ConvergenceMonitor(controller.EARLY_STOPPING_GENERATIONS, controller.EARLY_STOPPING_TOLERANCE,
+                                 controller.DIVERSITY_TOLERANCE)
+    hof = tools.HallOfFame(controller.HALL_OF_FAME_SIZE)
+
+    def record(gen, island_records):
+        logbook.record(gen=gen, **_combine_records(island_records))
+        print(logbook.stream)
+        # Главы добавляются после вывода: поток показывает только общие столбцы, главы - в logbook.chapters
+        for name, (island_record, _) in zip(island_names, island_records):
+            chapter = logbook.chapters[name]
+            chapter.header = logbook.header
+            chapter.record(gen=gen, **island_record)
+        return monitor.update(logbook[-1]['min'], logbook[-1]['div'])
+
+    try:
+        starts = [island.start() for island in islands]
+        record(0, [start[0] for start in starts])
+
+        gen = 0
+        immigrants = [[] for _ in range(n_islands)]
+        # С ранней остановкой острова идут по одному поколению, чтобы не считать поколения после остановки
+        batch = 1 if controller.EARLY_STOPPING_GENERATIONS else controller.MIGRATION_INTERVAL
+        stopped = False
+        while gen < controller.MAX_GENERATIONS and not stopped:
+            next_migration = (gen // controller.MIGRATION_INTERVAL + 1) * controller.MIGRATION_INTERVAL
+            generations = min(batch, next_migration - gen, controller.MAX_GENERATIONS - gen)
+            if processes:
+                for island, arrivals in zip(islands, immigrants):
+                    island.submit(arrivals, generations)
+                results = [island.result() for island in islands]
+            else:
+                results = [island.evolve(arrivals, generations) for island, arrivals in zip(islands, immigrants)]
+
+            for step in range(generations):
+                gen += 1
+                if record(gen, [records[step] for records, _, _ in results]):
+                    stopped = True
+                    print(f"Ранняя остановка: лучший результат и разнообразие не менялись "
+                          f"{monitor.patience} поколений.")
+                    break
+
+            hof.update([best for _, _, best in results])
+            if gen % controller.MIGRATION_INTERVAL == 0 or gen == controller.MAX_GENERATIONS:
+                emigrants = [island_emigrants for _, island_emigrants, _ in results]
+                immigrants = [tools.selBest([ind for source in island_sources for ind in emigrants[source]],
+                                            controller.MIGRATION_SIZE) for island_sources in sources]
+            else:
+                immigrants = [[] for _ in range(n_islands)]
+    finally:
+        island_entries = [island.close() for island in islands]
+
+    # Острова пишут в копии кэша модели: записи сливаются в кэш контроллера и сохраняются один раз
+    cache = controller.model.cache
+    if cache is not None:
+        for entries in island_entries:
+            cache.put_many([key for key, _ in entries], [value for _, value in entries])
+        controller.model.save_cache()
+    return hof.items[0], logbook
@@ -0,0 +1,361 @@
+# leaderboard_manager.py
+import datetime
+import heapq
+import json
+import math
+import os
+import sqlite3
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Старый формат Зала Славы (весь файл перезаписывался после каждой гонки), читается только для переноса
+LEADERBOARD_FILE = "leaderboard.json"
+RESULTS_FILE = "race_results.jsonl"
+LEADERBOARD_SIZE = 10
+# Ширина корзины гистограммы лучших кругов, сек
+BEST_LAP_BIN = 0.5
+
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS strategies (
+    key TEXT PRIMARY KEY,
+    strategy TEXT NOT NULL,
+    starts INTEGER NOT NULL DEFAULT 0,
+    wins INTEGER NOT NULL DEFAULT 0,
+    dnf INTEGER NOT NULL DEFAULT 0,
+    best_lap_min REAL,
+    best_lap_sum REAL NOT NULL DEFAULT 0,
+    best_lap_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS best_lap_hist (
+    key TEXT NOT NULL,
+    bucket REAL NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, bucket)
+);
+"""
+
+
+def strategy_key(strategy):
+    if isinstance(strategy, str):
+        return strategy
+    return '-'.join(str(lap) for lap in strategy)
+
+
+class ResultsStore:
+    """Append-only log of race results with an incrementally maintained index.
+
+    Every race is one JSON line in `path`. The index is a sqlite database (`path` + '.index.db'): one small
+    meta row with the top-K winners by best lap (a heap), win counts and the log offset it covers, and
+    per-strategy aggregates and best-lap histograms in tables keyed by strategy. An append only touches
+    the meta row and the rows of its own cars, queries never rescan the log, and other writers' appends
+    are indexed from the offset on.
+    """
+
+    def __init__(self, path=RESULTS_FILE, top_k=LEADERBOARD_SIZE):
+        self.path = path
+        self.index_path = path + '.index.db'
+        self.lock_path = path + '.lock'
+        self.top_k = top_k
+        self.index = self._empty_index()
+
+    def _empty_index(self):
+        return {
+            'offset': 0,
+            'races': 0,
+            'top_k': self.top_k,
+            # Куча наихудших из лучших: [-best_lap_time, -seq, entry], в корне - кандидат на вытеснение
+            'top': [],
+            'wins': {},
+        }
+
+    @contextmanager
+    def _lock(self):
+        """Exclusive lock shared by every process writing to this log."""
+        with open(self.lock_path, 'a+') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _open_db(self):
+        db = sqlite3.connect(self.index_path)
+        try:
+            db.executescript(INDEX_SCHEMA)
+        except sqlite3.DatabaseError:
+            # Индекс повреждён - удаляем, он строится заново по журналу
+            db.close()
+            os.remove(self.index_path)
+            db = sqlite3.connect(self.index_path)
+            db.executescript(INDEX_SCHEMA)
+        return db
+
+    @contextmanager
+    def _db(self):
+        """Index connection with one transaction for the block (committed on success)."""
+        db = self._open_db()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _clear_index(self, db):
+        db.execute("DELETE FROM strategies")
+        db.execute("DELETE FROM best_lap_hist")
+        self.index = self._empty_index()
+
+    def _load_index(self, db):
+        row = db.execute("SELECT value FROM meta WHERE name = 'index'").fetchone()
+        index = json.loads(row[0]) if row else None
+        if index is None or index.get('top_k') != self.top_k:
+            # Индекс потерян или построен для другого K - строим заново по всему журналу
+            self._clear_index(db)
+        else:
+            self.index = index
+
+    def _save_index(self, db):
+        db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('index', ?)", (json.dumps(self.index),))
+
+    def _refresh(self, db):
+        """Brings the index up to the last complete line of the log; returns True if it changed."""
+        self._load_index(db)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size < self.index['offset']:
+            self._clear_index(db)
+            return True
+        changed = False
+        if size > self.index['offset']:
+            with open(self.path, 'rb') as f:
+                f.seek(self.index['offset'])
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # недописанная строка прерванной записи
+                    try:
+                        race = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        race = None  # повреждённая строка пропускается
+                    if race is not None:
+                        self._index_race(db, race)
+                    self.index['offset'] += len(line)
+                    changed = True
+        return changed
+
+    def _index_race(self, db, race):
+        index = self.index
+        index['races'] += 1
+        seq = index['races']
+
+        winner = race.get('winner')
+        if winner is not None:
+            index['wins'][winner] = index['wins'].get(winner, 0) + 1
+            best_lap_time = race.get('best_lap_time')
+            if best_lap_time is not None:
+                entry = {key: race.get(key) for key in
+                         ('date', 'seed', 'winner', 'total_time', 'best_lap_time', 'total_laps', 'strategy')}
+                item = [-best_lap_time, -seq, entry]
+                if len(index['top']) < self.top_k:
+                    heapq.heappush(index['top'], item)
+                elif item > index['top'][0]:
+                    heapq.heapreplace(index['top'], item)
+
+        for car in race.get('cars', []):
+            key = strategy_key(car['strategy'])
+            best_lap_time = car.get('best_lap_time')
+            db.execute("INSERT OR IGNORE INTO strategies (key, strategy) VALUES (?, ?)",
+                       (key, json.dumps(car['strategy'])))
+            db.execute("""
+                UPDATE strategies SET
+                    starts = starts + 1,
+                    wins = wins + ?,
+                    dnf = dnf + ?,
+                    best_lap_min = CASE WHEN ? IS NOT NULL AND (best_lap_min IS NULL OR ? < best_lap_min)
+                                        THEN ? ELSE best_lap_min END,
+                    best_lap_sum = best_lap_sum + ?,
+                    best_lap_count = best_lap_count + ?
+                WHERE key = ?""",
+                       (winner is not None and car['name'] == winner, bool(car['is_dnf']),
+                        best_lap_time, best_lap_time, best_lap_time,
+                        best_lap_time or 0.0, best_lap_time is not None, key))
+            if best_lap_time is not None:
+                bucket = math.floor(best_lap_time / BEST_LAP_BIN) * BEST_LAP_BIN
+                db.execute("INSERT OR IGNORE INTO best_lap_hist (key, bucket) VALUES (?, ?)", (key, bucket))
+                db.execute("UPDATE best_lap_hist SET count = count + 1 WHERE key = ? AND bucket = ?", (key, bucket))
+
+    def append(self, races):
+        """Appends race results (dicts from race_result) to the log and updates the index under the lock."""
+        if isinstance(races, dict):
+            races = [races]
+        lines = [(json.dumps(race, ensure_ascii=False) + '\n').encode('utf-8') for race in races]
+        with self._lock(), self._db() as db:
+            self._refresh(db)
+            with open(self.path, 'ab') as f:
+                # Хвост прерванной записи отрезается, иначе он склеится со следующей строкой
+                f.truncate(self.index['offset'])
+                for line, race in zip(lines, races):
+                    f.write(line)
+                    self._index_race(db, race)
+                f.flush()
+                os.fsync(f.fileno())
+                self.index['offset'] = f.tell()
+            self._save_index(db)
+
+    def sync(self):
+        """Indexes results appended by other processes since the last call."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size == self.index['offset'] and os.path.exists(self.index_path):
+            return
+        with self._lock(), self._db() as db:
+            if self._refresh(db):
+                self._save_index(db)
+
+    def top(self, k=None):
+        """Leaderboard entries sorted by best lap time (ties keep the earlier race first)."""
+        self.sync()
+        entries = [entry for _, _, entry in sorted(self.index['top'], reverse=True)]
+        return entries[:k] if k is not None else entries
+
+    def race_count(self):
+        self.sync()
+        return self.index['races']
+
+    def win_counts(self, by='winner'):
+        """Wins per agent name (`by='winner'`) or per strategy (`by='strategy'`)."""
+        self.sync()
+        if by == 'winner':
+            counts = self.index['wins']
+        elif by == 'strategy':
+            with self._db() as db:
+                counts = dict(db.execute("SELECT key, wins FROM strategies WHERE wins > 0"))
+        else:
+            raise ValueError(f"Unknown grouping {by!r}, expected 'winner' or 'strategy'")
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def strategy_stats(self, strategy=None):
+        """Aggregated starts, wins, DNFs and best-lap statistics per strategy (or for one strategy).
+
+        `strategy` is a list of pit laps or its key from win_counts(by='strategy').
+        """
+        self.sync()
+        query = "SELECT key, strategy, starts, wins, dnf, best_lap_min, best_lap_sum, best_lap_count FROM strategies"
+        with self._db() as db:
+            if strategy is not None:
+                rows = db.execute(query + " WHERE key = ?", (strategy_key(strategy),)).fetchall()
+            else:
+                rows = db.execute(query).fetchall()
+        stats = {key: {'strategy': json.loads(strategy_json), 'starts': starts, 'wins': wins, 'dnf': dnf,
+                       'best_lap_min': best_lap_min, 'best_lap_sum': best_lap_sum, 'best_lap_count': best_lap_count}
+                 for key, strategy_json, starts, wins, dnf, best_lap_min, best_lap_sum, best_lap_count in rows}
+        if strategy is not None:
+            return next(iter(stats.values()), None)
+        return stats
+
+    def best_lap_distribution(self, strategy):
+        """Histogram {bin start: count} of the per-race best lap of `strategy`, bins of BEST_LAP_BIN sec."""
+        self.sync()
+        with self._db() as db:
+            rows = db.execute("SELECT bucket, count FROM best_lap_hist WHERE key = ? ORDER BY bucket",
+                              (strategy_key(strategy),)).fetchall()
+        return {bucket: count for bucket, count in rows}
+
+    def iter_results(self):
+        """Streams every race result from the log (full scan, for offline analysis; damaged lines are skipped)."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    continue
+                try:
+                    yield json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+
+    def import_legacy_leaderboard(self, path=LEADERBOARD_FILE):
+        """Moves the entries of the old whole-file leaderboard.json into an empty log."""
+        if os.path.exists(self.path) or not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                entries = json.load(f)
+            except json.JSONDecodeError:
+                return 0
+        self.append([dict(entry, cars=[]) for entry in entries])
+        return len(entries)
+
+
+_stores = {}
+
+
+def get_results_store(path=RESULTS_FILE):
+    """Shared ResultsStore for `path`; the legacy leaderboard.json is imported on first use."""
+    if path not in _stores:
+        store = ResultsStore(path)
+        store.import_legacy_leaderboard()
+        _stores[path] = store
+    return _stores[path]
+
+
+def race_result(engine, strategies, best_lap_times):
+    """One race as a results-log record: the winner's leaderboard fields plus every car's outcome."""
+    cars = []
+    for car in sorted(engine.cars, key=lambda c: c.position):
+        cars.append({
+            'name': car.name,
+            'position': car.position,
+            'strategy': list(strategies[car.name]),
+            'total_time': car.total_time,
+            'best_lap_time': best_lap_times.get(car.name),
+            'is_dnf': car.is_dnf,
+            'dnf_lap': car.dnf_lap,
+        })
+
+    winner = cars[0] if cars and not cars[0]['is_dnf'] else None
+    return {
+        'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'seed': engine.random_seed,
+        'winner': winner['name'] if winner else None,
+        'total_time': winner['total_time'] if winner else None,
+        'best_lap_time': winner['best_lap_time'] if winner else None,
+        'total_laps': engine.TOTAL_LAPS if winner else None,
+        'strategy': winner['strategy'] if winner else None,
+        'cars': cars,
+    }
+
+
+def load_leaderboard():
+    return get_results_store().top()
+
+
+def print_leaderboard(leaderboard):
+    print("\n🏆 Зал Славы (Топ-10):")
+    for i, entry in enumerate(leaderboard):
+        print(f"{i + 1}. Победитель: {entry['winner']}")
+        print(f"   Общее время: {entry['total_time']:.2f} сек")
+        best_lap_time = entry.get('best_lap_time')
+        print(f"   Лучший круг: {best_lap_time:.2f} сек" if best_lap_time is not None else "   Лучший круг: N/A")
+        print(f"   Всего кругов: {entry['total_laps']}")
+        print(f"   Стратегия: {entry['strategy']}")
+
+
+def update_leaderboard(race):
+    """Adds a race (see race_result) to the results log and prints the Hall of Fame."""
+    store = get_results_store()
+    store.append(race)
+    print("Результаты победителя обновлены в Зале Славы.")
+    print_leaderboard(store.top())
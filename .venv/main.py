@@ -0,0 +1,73 @@
+# main.py
+import argparse
+import contextlib
+
+from race_engine import make_race_engine
+from season import find_strategies, history_best_lap_times, run_season
+from leaderboard_manager import get_results_store, race_result, update_leaderboard
+from config import config_editor
+from profiling import PhaseProfiler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Гонка нейросетей")
+    parser.add_argument("--solver", choices=["ga", "dp"], default="ga",
+                        help="ga - генетический алгоритм каждого агента, "
+                             "dp - точное динамическое программирование по прогнозу погоды")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="число процессов для поиска стратегий агентов (по умолчанию - все ядра)")
+    parser.add_argument("--season", type=int, default=None, metavar="N",
+                        help="сезон из N гонок без интерфейса, результаты дописываются в race_results.jsonl")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="сид гонки (в режиме сезона - сид первой гонки, далее подряд)")
+    parser.add_argument("--headless", action="store_true", help="не открывать окно визуализации")
+    parser.add_argument("--profile", action="store_true", help="вывести время по фазам поиска стратегий и гонки")
+    parser.add_argument("--cprofile", default=None, metavar="PATH", help="сохранить cProfile профиль в PATH")
+    args = parser.parse_args()
+
+    car_names = [f"Agent-{i + 1}" for i in range(10)]
+
+    if args.season is not None:
+        first_seed = args.seed if args.seed is not None else 1
+        run_season(range(first_seed, first_seed + args.season), car_names, args.solver, workers=args.workers)
+        raise SystemExit
+
+    engine = make_race_engine(car_names, random_seed=args.seed)
+
+    profiler = PhaseProfiler(args.cprofile) if args.profile or args.cprofile else None
+    with profiler.attach(engine=engine) if profiler else contextlib.nullcontext():
+        with profiler.phase("strategy_search") if profiler else contextlib.nullcontext():
+            strategies = find_strategies(engine, car_names, args.solver, workers=args.workers, verbose=True)
+
+        print("\nШаг 2: Нейросети выходят на старт!")
+        for name, strategy in strategies.items():
+            engine.set_strategy(name, strategy)
+
+        cars_final, race_history = engine.run_race_lap_by_lap()
+    if profiler:
+        print("\n⏱ Время по фазам:")
+        print(profiler.format_report())
+
+    print("\nШаг 3: Гонка завершена!")
+    final_standings = sorted(cars_final, key=lambda c: c.position)
+
+    print("\n🏁 Финальные результаты гонки:")
+    for car in final_standings:
+        if not car.is_dnf:
+            print(f"Позиция {car.position}: {car.name} - Общее время: {car.total_time:.2f} сек.")
+        else:
+            print(f"Позиция {car.position}: {car.name} - Сход на круге {car.dnf_lap}")
+
+    winner = final_standings[0]
+
+    # Сбор данных для лидерборда: лучший круг каждой машины
+    race = race_result(engine, strategies, history_best_lap_times(race_history))
+    if not winner.is_dnf:
+        update_leaderboard(race)
+    else:
+        get_results_store().append(race)
+
+    if not args.headless:
+        from race_visualizer import RaceVisualizer
+
+        app = RaceVisualizer(car_names, race_history, strategies)
+        app.mainloop()
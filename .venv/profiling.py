@@ -0,0 +1,114 @@
+# profiling.py
+import cProfile
+import functools
+import time
+from contextlib import contextmanager
+
+# Операторы toolbox и фазы, к которым относится их время
+TOOLBOX_PHASES = {
+    'select': 'selection',
+    'clone': 'cloning',
+    'mate': 'variation',
+    'mutate': 'variation',
+    'evaluate': 'evaluation',
+    'evaluate_population': 'evaluation',
+}
+# Методы движка и модели: (атрибут, фаза); берётся первый найденный
+ENGINE_PHASES = [('_run_lap', 'lap_update'), ('run_race_lap_by_lap', 'race')]
+MODEL_PHASES = [('_simulate_population', 'simulation'), ('_run_simulation', 'simulation')]
+
+
+class PhaseProfiler:
+    """Opt-in per-phase wall-clock timers for the GA and race hot paths, with an optional cProfile dump.
+
+    attach() wraps toolbox operators and engine/model methods of the given objects and restores them on
+    exit, so nothing is timed (and no code path changes) unless a profiler is attached.
+    """
+
+    def __init__(self, cprofile_path=None):
+        self.cprofile_path = cprofile_path
+        self.totals = {}
+        self.calls = {}
+        self.wall_time = 0.0
+        self._profile = None
+
+    def _add(self, name, elapsed):
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    @contextmanager
+    def phase(self, name):
+        """Times a block of code as one call of phase `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._add(name, time.perf_counter() - start)
+
+    def _timed(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._add(name, time.perf_counter() - start)
+        return wrapper
+
+    def _wrap(self, obj, attr, name, restore):
+        had_own = attr in vars(obj)
+        original = getattr(obj, attr)
+        setattr(obj, attr, self._timed(name, original))
+        restore.append((obj, attr, original if had_own else None))
+
+    @contextmanager
+    def attach(self, controller=None, agent=None, engine=None, model=None):
+        """Instruments a RaceController / AgentGA toolbox, a race engine and a RaceModel for the block."""
+        restore = []
+        for owner in (controller, agent):
+            if owner is None:
+                continue
+            for attr, name in TOOLBOX_PHASES.items():
+                if hasattr(owner.toolbox, attr):
+                    self._wrap(owner.toolbox, attr, name, restore)
+        for obj, phases in ((engine, ENGINE_PHASES), (model, MODEL_PHASES)):
+            if obj is None:
+                continue
+            for attr, name in phases:
+                if hasattr(obj, attr):
+                    self._wrap(obj, attr, name, restore)
+                    break
+
+        # Один cProfile на все attach(): файл содержит накопленный профиль
+        if self.cprofile_path and self._profile is None:
+            self._profile = cProfile.Profile()
+        start = time.perf_counter()
+        if self._profile is not None:
+            self._profile.enable()
+        try:
+            yield self
+        finally:
+            if self._profile is not None:
+                self._profile.disable()
+                self._profile.dump_stats(self.cprofile_path)
+            self.wall_time += time.perf_counter() - start
+            for obj, attr, original in reversed(restore):
+                if original is None:
+                    delattr(obj, attr)
+                else:
+                    setattr(obj, attr, original)
+
+    def report(self):
+        """{phase: (calls, total seconds)} sorted by total time."""
+        return {name: (self.calls[name], total)
+                for name, total in sorted(self.totals.items(), key=lambda item: -item[1])}
+
+    def format_report(self):
+        lines = [f"{'Фаза':<14}{'вызовов':>10}{'всего, с':>12}{'на вызов, мс':>15}{'доля':>8}"]
+        for name, (calls, total) in self.report().items():
+            share = total / self.wall_time if self.wall_time else 0.0
+            lines.append(f"{name:<14}{calls:>10}{total:>12.3f}{total / calls * 1000:>15.3f}{share:>8.1%}")
+        lines.append(f"{'всего':<14}{'':>10}{self.wall_time:>12.3f}")
+        if self.cprofile_path:
+            lines.append(f"cProfile: {self.cprofile_path}")
+        return '\n'.join(lines)
@@ -0,0 +1,407 @@
+# race_controller.py
+
+from deap import base, creator, tools
+import itertools
+import operator
+import random
+import numpy as np
+from config import config_editor
+from agent_ga import clone_individual, register_creator_classes
+
+
+def gene_moments(population):
+    """Per-gene mean and variance of the pit laps of a population."""
+    # Суммы и суммы квадратов кругов считаются точно в целых числах, по строкам генов
+    laps = np.asarray(population, dtype=np.int64).T.copy()
+    n = laps.shape[1]
+    total = laps.sum(axis=1)
+    return total / n, (n * np.einsum('ij,ij->i', laps, laps) - total * total) / (n * n)
+
+
+def population_diversity(population=None, moments=None):
+    """Mean per-gene standard deviation of the pit laps, in laps."""
+    _, variance = gene_moments(population) if moments is None else moments
+    return float(np.sqrt(variance).mean())
+
+
+def random_pit_stops(size, rng, n_stops, min_stint, total_laps):
+    """`size` sorted chromosomes drawn like RaceController's generate_pit_stops, as a (size, n_stops) array."""
+    genes = np.empty((size, n_stops), dtype=np.int64)
+    last_pit_lap = np.zeros(size, dtype=np.int64)
+    for i in range(n_stops):
+        min_lap = last_pit_lap + min_stint
+        max_lap = total_laps - (n_stops - i - 1) * min_stint
+        genes[:, i] = np.where(min_lap >= max_lap, max_lap, rng.integers(np.minimum(min_lap, max_lap), max_lap + 1))
+        last_pit_lap = genes[:, i]
+    return np.sort(genes, axis=1)
+
+
+def select_tournament(fitness, k, rng, tournsize):
+    """tools.selTournament on a fitness array (lower is better): indices of the k tournament winners."""
+    aspirants = rng.integers(len(fitness), size=(k, tournsize))
+    return aspirants[np.arange(k), fitness[aspirants].argmin(axis=1)]
+
+
+def crossover_two_point(genes, rng, probability):
+    """tools.cxTwoPoint of the row pairs (0, 1), (2, 3), ... with the given probability, in place.
+
+    Returns the mask of rows that were mated; the rows stay sorted.
+    """
+    n_pairs, size = len(genes) // 2, genes.shape[1]
+    changed = np.zeros(len(genes), dtype=bool)
+    if size < 2 or not n_pairs:
+        return changed
+    draws = rng.random((n_pairs, 3))
+    mated = draws[:, 0] < probability
+    # Те же точки разреза, что у cxTwoPoint: [point1, point2) при 1 <= point1 < point2 <= size
+    point1 = (draws[:, 1] * size).astype(np.int64) + 1
+    point2 = (draws[:, 2] * (size - 1)).astype(np.int64) + 1
+    point2 += point2 >= point1
+    point1, point2 = np.minimum(point1, point2), np.maximum(point1, point2)
+    columns = np.arange(size)
+    swap = (columns >= point1[:, None]) & (columns < point2[:, None]) & mated[:, None]
+
+    pairs = genes[:2 * n_pairs].reshape(n_pairs, 2, size)
+    first = np.where(swap, pairs[:, 1], pairs[:, 0])
+    pairs[:, 1] = np.where(swap, pairs[:, 0], pairs[:, 1])
+    pairs[:, 0] = first
+    # Строки без скрещивания уже отсортированы, сортировка их не меняет
+    genes.sort(axis=1)
+    changed[:2 * n_pairs] = np.repeat(mated, 2)
+    return changed
+
+
+def mutate_pit_stops(genes, rng, probability, indpb, min_stint, total_laps):
+    """Moves pit laps of the rows chosen with `probability` within their neighbours' stint bounds, in place.
+
+    Every gene of a chosen row moves with probability indpb to a random lap at least min_stint laps from
+    the previous (already moved) and the next pit lap. Returns the mask of chosen rows; the rows stay sorted.
+    """
+    mutated = rng.random(len(genes)) < probability
+    rows = np.flatnonzero(mutated)
+    size = genes.shape[1]
+    draws = rng.random((len(rows), size, 2))
+    for i in range(size):
+        moved = draws[:, i, 0] < indpb
+        laps = genes[rows[moved]]
+        min_lap = (laps[:, i - 1] if i > 0 else np.zeros(len(laps), dtype=genes.dtype)) + min_stint
+        max_lap = (laps[:, i + 1] if i < size - 1 else np.full(len(laps), total_laps)) - min_stint
+        valid = min_lap < max_lap
+        new_lap = min_lap + (draws[moved, i, 1] * (max_lap - min_lap + 1)).astype(np.int64)
+        genes[rows[moved][valid], i] = new_lap[valid]
+    genes[rows] = np.sort(genes[rows], axis=1)
+    return mutated
+
+
+def individuals_from_arrays(genes, fitness):
+    """creator.Individual chromosomes with valid fitness from pit-lap rows and fitness values."""
+    # Объекты собираются напрямую, как в clone_individual
+    weight = creator.FitnessMin.weights[0]
+    population = []
+    for row, value in zip(genes.tolist(), fitness.tolist()):
+        individual = list.__new__(creator.Individual)
+        individual.extend(row)
+        individual.fitness = fit = creator.FitnessMin.__new__(creator.FitnessMin)
+        fit.wvalues = (value * weight,)
+        population.append(individual)
+    return population
+
+
+class ConvergenceMonitor:
+    """Early stopping once the best fitness and population diversity have not changed for `patience` generations."""
+
+    def __init__(self, patience, best_tolerance=1e-6, diversity_tolerance=2.0):
+        self.patience = patience
+        self.best_tolerance = best_tolerance
+        self.diversity_tolerance = diversity_tolerance
+        self.best = None
+        self.diversity = None
+        self.stalled = 0
+
+    def update(self, best, diversity):
+        """Registers one generation; returns True when the run should stop."""
+        if (self.best is None or self.best - best > self.best_tolerance
+                or abs(diversity - self.diversity) > self.diversity_tolerance):
+            self.best, self.diversity, self.stalled = best, diversity, 0
+        else:
+            self.stalled += 1
+        return self.patience is not None and self.stalled >= self.patience
+
+
+class RaceController:
+    def __init__(self, model, scenarios=None, risk='mean', alpha=0.9, incremental=False):
+        self.model = model
+        # Устойчивый режим: фитнес - мера риска времени гонки по набору погодных сценариев
+        self.scenarios = scenarios
+        self.risk = risk
+        self.alpha = alpha
+        # Инкрементальный режим: потомки досимулируются от контрольной точки общего префикса пит-стопов.
+        # Досимуляция идёт скалярным циклом по кругам, поэтому режим ускоряет только поштучную оценку
+        # (_run_simulation); GA по умолчанию считает поколение пакетно и быстрее в несколько раз (~6x)
+        self.incremental = incremental
+        if self.incremental and self.scenarios is not None:
+            raise ValueError("Incremental evaluation does not support weather scenarios")
+
+        self.LENGTH_CHROM = self.model.REQUIRED_PIT_STOPS
+        self.POPULATION_SIZE = 500
+        self.P_CROSSOVER = 0.9
+        self.P_MUTATION = 0.2
+        self.MAX_GENERATIONS = 80
+        self.HALL_OF_FAME_SIZE = 3
+        # Размер пачки для toolbox.map при оценке (None - одна пачка на поколение)
+        self.EVAL_CHUNK_SIZE = None
+
+        # Ранняя остановка: None - всегда MAX_GENERATIONS поколений
+        self.EARLY_STOPPING_GENERATIONS = None
+        self.EARLY_STOPPING_TOLERANCE = 1e-6
+        self.DIVERSITY_TOLERANCE = 2.0
+
+        # Островная модель (run_island_ga)
+        self.N_ISLANDS = 4
+        self.MIGRATION_INTERVAL = 5
+        self.MIGRATION_SIZE = 5
+        self.MIGRATION_TOPOLOGY = 'ring'
+
+        register_creator_classes()
+        self.toolbox = base.Toolbox()
+
+        def generate_pit_stops():
+            pit_stops = []
+            last_pit_lap = 0
+            for _ in range(self.model.REQUIRED_PIT_STOPS):
+                min_lap = last_pit_lap + self.model.MIN_STINT_LENGTH
+                max_lap = self.model.TOTAL_LAPS - (self.model.REQUIRED_PIT_STOPS - len(pit_stops) - 1) * self.model.MIN_STINT_LENGTH
+                if min_lap >= max_lap:
+                    pit_stops.append(max_lap)
+                else:
+                    pit_stops.append(random.randint(min_lap, max_lap))
+                last_pit_lap = pit_stops[-1]
+            pit_stops.sort()
+            return pit_stops
+
+        self.toolbox.register("individualCreator", tools.initIterate, creator.Individual, generate_pit_stops)
+        self.toolbox.register("clone", clone_individual)
+        # Начальная популяция генерируется сразу массивом генератором self.rng (см. init_population_arrays)
+        self.toolbox.register("genesCreator", self.random_genes)
+        self.toolbox.register("populationCreator", self.random_population)
+        if self.incremental:
+            self.toolbox.register("evaluate_population", self.model.evaluate_incremental)
+            self.toolbox.register("evaluate",
+                                  lambda individual: (float(self.toolbox.evaluate_population([individual])[0]),))
+        elif self.scenarios is None:
+            self.toolbox.register("evaluate", self.model.evaluate_strategy)
+            self.toolbox.register("evaluate_population", self.model.evaluate_population)
+        else:
+            self.toolbox.register("evaluate_population", self.model.evaluate_robust, scenarios=self.scenarios,
+                                  risk=self.risk, alpha=self.alpha)
+            self.toolbox.register("evaluate",
+                                  lambda individual: (float(self.toolbox.evaluate_population([individual])[0]),))
+        # Отбор и изменчивость работают над массивами генов популяции и генератором self.rng (см. next_generation)
+        self.toolbox.register("select", select_tournament, tournsize=3)
+        self.toolbox.register("mate", crossover_two_point)
+        self.toolbox.register("mutate", mutate_pit_stops, indpb=1.0 / self.LENGTH_CHROM,
+                              min_stint=self.model.MIN_STINT_LENGTH, total_laps=self.model.TOTAL_LAPS)
+        self.rng = np.random.default_rng(random.getrandbits(64))
+        # Популяция последнего поколения и её массивы генов и фитнеса (см. population_arrays)
+        self._arrays = [], None, None
+
+        # Статистика считается по массиву фитнеса популяции
+        self.stats = tools.Statistics()
+        self.stats.register("min", np.min)
+        self.stats.register("avg", np.mean)
+        self.hof = tools.HallOfFame(self.HALL_OF_FAME_SIZE)
+
+    def calculate_strategy_laps(self, strategy):
+        strategy_laps = []
+        last_lap = 0
+        for pit_lap in strategy:
+            strategy_laps.append(f"{pit_lap - last_lap} кругов")
+            last_lap = pit_lap
+        strategy_laps.append(f"{self.model.TOTAL_LAPS - last_lap} кругов")
+        return strategy_laps
+
+    def random_genes(self, n):
+        """(n, LENGTH_CHROM) array of chromosomes drawn like generate_pit_stops with self.rng."""
+        return random_pit_stops(n, self.rng, self.LENGTH_CHROM, self.model.MIN_STINT_LENGTH, self.model.TOTAL_LAPS)
+
+    def random_population(self, n):
+        """n not yet evaluated individuals of toolbox.genesCreator."""
+        return [creator.Individual(row) for row in self.toolbox.genesCreator(n=n).tolist()]
+
+    def evaluate_genes(self, genes):
+        """Fitness values of the rows of a pit-lap array from batch calls to the model through toolbox.map.
+
+        Rows are split into EVAL_CHUNK_SIZE chunks (one chunk by default), so registering a process
+        pool's map as toolbox.map spreads the chunks over its workers.
+        """
+        if not len(genes):
+            return np.empty(0)
+        size = self.EVAL_CHUNK_SIZE or len(genes)
+        chunks = [genes[i:i + size] for i in range(0, len(genes), size)]
+        return np.concatenate(list(self.toolbox.map(self.toolbox.evaluate_population, chunks)))
+
+    def evaluate_individuals(self, individuals):
+        """Assigns fitness to the given individuals with evaluate_genes."""
+        if not individuals:
+            return
+        fitnesses = self.evaluate_genes(np.array(individuals, dtype=np.int64))
+        for ind, fit in zip(individuals, fitnesses.tolist()):
+            ind.fitness.values = (fit,)
+
+    def population_arrays(self, population):
+        """Pit laps (individuals, LENGTH_CHROM) and fitness values of an evaluated population as arrays.
+
+        next_generation keeps the arrays of the population it produces, so they are only rebuilt when the
+        list was changed from outside (e.g. by migration).
+        """
+        members, genes, fitness = self._arrays
+        if len(members) != len(population) or not all(map(operator.is_, members, population)):
+            genes = np.fromiter(itertools.chain.from_iterable(population), dtype=np.int64)
+            genes = genes.reshape(len(population), -1)
+            fitness = np.array([ind.fitness.values[0] for ind in population])
+            self._arrays = list(population), genes, fitness
+        return genes, fitness
+
+    def cache_record(self):
+        """Returns the model cache counters accumulated since the previous call (empty without a cache)."""
+        if self.model.cache is None:
+            return {}
+        stats = self.model.cache.stats()
+        record = {name: stats[name] - self._cache_stats.get(name, 0) for name in ('hits', 'misses', 'evictions')}
+        self._cache_stats = stats
+        return record
+
+    def checkpoint_record(self):
+        """Returns laps simulated and skipped by incremental evaluation since the previous call."""
+        if not self.incremental:
+            return {}
+        stats = self.model.checkpoints.stats()
+        record = {
+            'laps_sim': stats['laps_simulated'] - self._checkpoint_stats.get('laps_simulated', 0),
+            'laps_skip': stats['laps_skipped'] - self._checkpoint_stats.get('laps_skipped', 0),
+        }
+        self._checkpoint_stats = stats
+        return record
+
+    def logbook_header(self):
+        """Logbook columns of one population: stats, diversity and the model counters that are enabled."""
+        header = ['gen', 'nevals'] + (self.stats.fields if self.stats else []) + ['div']
+        if self.model.cache is not None:
+            header += ['hits', 'misses', 'evictions']
+        if self.incremental:
+            header += ['laps_sim', 'laps_skip']
+        return header
+
+    def reset_counters(self):
+        self._cache_stats = self.model.cache.stats() if self.model.cache is not None else {}
+        self._checkpoint_stats = self.model.checkpoints.stats() if self.incremental else {}
+
+    def arrays_record(self, genes, fitness, nevals):
+        """Logbook record of a population given as arrays: fitness stats, diversity and model counters."""
+        record = {name: function(fitness) for name, function in self.stats.functions.items()} if self.stats else {}
+        return dict(nevals=nevals, **record, div=population_diversity(genes), **self.cache_record(),
+                    **self.checkpoint_record())
+
+    def generation_record(self, population, nevals):
+        """Logbook record of a population: fitness stats, diversity and model counters since the last record."""
+        return self.arrays_record(*self.population_arrays(population), nevals)
+
+    def population_from_arrays(self, genes, fitness):
+        """Evaluated creator.Individual population of the given arrays (population_arrays returns them back)."""
+        population = individuals_from_arrays(genes, fitness)
+        self._arrays = list(population), genes, fitness
+        return population
+
+    def update_hall_of_fame(self, genes, fitness):
+        """hof.update with the rows of the arrays that can enter it: better than the worst member of a full
+        hall of fame and not equal to a member (hof.update would skip the others).
+        """
+        if self.hof is None:
+            return
+        candidates = np.arange(len(genes))
+        if self.hof.maxsize and len(self.hof) == self.hof.maxsize:
+            candidates = np.flatnonzero(fitness < self.hof[-1].fitness.values[0])
+            members = np.array(self.hof.items, dtype=np.int64).reshape(len(self.hof), -1)
+            candidates = candidates[~(genes[candidates, None, :] == members).all(axis=2).any(axis=1)]
+        candidates = candidates[np.argsort(fitness[candidates], kind='stable')]
+        if self.hof.maxsize and len(candidates) > self.hof.maxsize:
+            # Войти могут только maxsize лучших различных строк: повторы одной особи отбрасываются
+            distinct = {}
+            for candidate, row in zip(candidates.tolist(), map(tuple, genes[candidates].tolist())):
+                distinct.setdefault(row, candidate)
+                if len(distinct) == self.hof.maxsize:
+                    break
+            candidates = np.array(list(distinct.values()), dtype=np.int64)
+        self.hof.update(individuals_from_arrays(genes[candidates], fitness[candidates]))
+
+    def init_population_arrays(self, size):
+        """Creates and evaluates a population as arrays and fills the hall of fame; returns (genes, fitness, nevals)."""
+        # Генератор популяции и операторов поколения берёт сид из random: запуск задаётся random.seed
+        self.rng = np.random.default_rng(random.getrandbits(64))
+        genes = np.asarray(self.toolbox.genesCreator(n=size), dtype=np.int64)
+        fitness = self.evaluate_genes(genes)
+        self.update_hall_of_fame(genes, fitness)
+        return genes, fitness, len(genes)
+
+    def init_population(self, size):
+        """Creates and evaluates a population and fills the hall of fame; returns (population, nevals)."""
+        genes, fitness, nevals = self.init_population_arrays(size)
+        return self.population_from_arrays(genes, fitness), nevals
+
+    def next_generation_arrays(self, genes, fitness):
+        """One elitist generation on the gene and fitness arrays of a population; returns (genes, fitness, nevals).
+
+        Tournament selection, two-point crossover of consecutive pairs and mutation run on the gene array;
+        only mated or mutated offspring are evaluated, the hall of fame is appended and then updated.
+        """
+        chosen = self.toolbox.select(fitness, len(genes) - self.HALL_OF_FAME_SIZE, self.rng)
+        offspring, offspring_fitness = genes[chosen], fitness[chosen]
+
+        invalid = self.toolbox.mate(offspring, self.rng, self.P_CROSSOVER)
+        invalid |= self.toolbox.mutate(offspring, self.rng, self.P_MUTATION)
+        invalid = np.flatnonzero(invalid)
+        offspring_fitness[invalid] = self.evaluate_genes(offspring[invalid])
+
+        if self.hof is not None and len(self.hof):
+            elite = self.hof.items
+            offspring = np.concatenate([offspring, np.array(elite, dtype=np.int64).reshape(len(elite), -1)])
+            offspring_fitness = np.concatenate([offspring_fitness, [ind.fitness.values[0] for ind in elite]])
+        self.update_hall_of_fame(offspring, offspring_fitness)
+        return offspring, offspring_fitness, len(invalid)
+
+    def next_generation(self, population):
+        """Replaces population with the next elitist generation in place; returns the number of evaluations."""
+        genes, fitness, nevals = self.next_generation_arrays(*self.population_arrays(population))
+        population[:] = self.population_from_arrays(genes, fitness)
+        return nevals
+
+    def run_ga_with_elitism(self):
+        logbook = tools.Logbook()
+        logbook.header = self.logbook_header()
+        self.reset_counters()
+        monitor = ConvergenceMonitor(self.EARLY_STOPPING_GENERATIONS, self.EARLY_STOPPING_TOLERANCE,
+                                     self.DIVERSITY_TOLERANCE)
+
+        genes, fitness, nevals = self.init_population_arrays(self.POPULATION_SIZE)
+        logbook.record(gen=0, **self.arrays_record(genes, fitness, nevals))
+        print(logbook.stream)
+
+        # Поколения идут на массивах: объекты особей нужны только залу славы
+        for gen in range(1, self.MAX_GENERATIONS + 1):
+            genes, fitness, nevals = self.next_generation_arrays(genes, fitness)
+            logbook.record(gen=gen, **self.arrays_record(genes, fitness, nevals))
+            print(logbook.stream)
+
+            if monitor.update(logbook[-1]['min'], logbook[-1]['div']):
+                print(f"Ранняя остановка: лучший результат и разнообразие не менялись "
+                      f"{monitor.patience} поколений.")
+                break
+
+        self.model.save_cache()
+        return self.hof.items[0], logbook
+
+    def run_island_ga(self, processes=True, eval_workers=None):
+        """Island-model mode: N_ISLANDS sub-populations exchanging migrants, see island_ga.run_islands."""
+        from island_ga import run_islands
+
+        return run_islands(self, processes=processes, eval_workers=eval_workers)
@@ -0,0 +1,364 @@
+# race_engine.py
+import random
+import numpy as np
+from config import config_editor
+from peremennue import TIRE_WEAR_RATE, TIRE_MISMATCH_PENALTY, TIRE_LIFESPAN
+import peremennue
+
+# Статусы круга в колоночном движке хранятся кодами (индекс в этом списке)
+LAP_STATUSES = ['🟢 Обычный круг', '💥 Взрыв шин! Сход!', '🚨 Аварийный пит-стоп', '🔄 Плановый пит-стоп', '❌ Сход']
+STATUS_CODES = {status: code for code, status in enumerate(LAP_STATUSES)}
+
+# Компактная запись одной машины на одном круге (dnf_lap = 0, пока машина в гонке)
+LAP_RECORD_DTYPE = np.dtype([
+    ('total_time', 'f8'),
+    ('lap_time', 'f8'),
+    ('tire_wear', 'f8'),
+    ('tire', 'i1'),
+    ('status', 'i1'),
+    ('is_dnf', '?'),
+    ('dnf_lap', 'i2'),
+    ('position', 'i2'),
+])
+# С этого числа машин колоночный движок быстрее RaceEngine (на малых сетках дороже накладные расходы NumPy).
+# Порог один для main.py и сезона, чтобы гонка с тем же сидом шла на том же движке: гонка сезона в массив
+# (run_race_to_array) окупается с ~25-30 машин, покруговые словари main.py - ближе к 50
+COLUMNAR_MIN_CARS = 30
+
+
+class RaceCar:
+    """Представляет одну гоночную машину в симуляции."""
+
+    def __init__(self, name, start_position=0):
+        self.name = name
+        self.current_lap = 0
+        self.total_time = 0
+        self.current_tire = 'Medium'
+        self.tire_wear = 0
+        self.tire_age = 0
+        self.pit_stop_count = 0
+        self.is_dnf = False
+        self.dnf_lap = None
+        self.last_pit_lap = 0
+        self.status = "🟢 Обычный круг"
+        self.position = start_position
+        self.emergency_pit_stop_used = False
+
+
+class RaceEngine:
+    """Управляет симуляцией гонки для нескольких машин."""
+
+    def __init__(self, car_names, random_seed=None):
+        if random_seed is None:
+            self.random_seed = random.randint(1, 1000)
+        else:
+            self.random_seed = random_seed
+        random.seed(self.random_seed)
+
+        self.TOTAL_LAPS = config_editor["TOTAL_LAPS"]
+        self.PIT_STOP_EXTRA_TIME_AVG = config_editor["PIT_STOP_EXTRA_TIME_AVG"]
+        self.TIME_PENALTY_PER_PERCENT_WEAR = config_editor["TIME_PENALTY_PER_PERCENT_WEAR"]
+
+        self.weather_sequence = self.generate_weather_sequence()
+        self.cars = [RaceCar(name) for name in car_names]
+        self.pit_stop_strategies = {}
+
+    def generate_weather_sequence(self):
+        weather = ['dry'] * self.TOTAL_LAPS
+        current = 'dry'
+        min_rain_duration = config_editor["MIN_RAIN_DURATION"]
+        max_rain_duration = config_editor["MAX_RAIN_DURATION"]
+        weather_probs = {'dry': {'dry': 0.85, 'light_rain': 0.15},
+                         'light_rain': {'dry': 0.1, 'light_rain': 0.5, 'medium_rain': 0.4},
+                         'medium_rain': {'light_rain': 0.2, 'medium_rain': 0.5, 'heavy_rain': 0.3},
+                         'heavy_rain': {'medium_rain': 0.4, 'heavy_rain': 0.6}}
+
+        rain_start = -1
+        for lap in range(self.TOTAL_LAPS):
+            if current == 'dry' and random.random() < 0.05 and lap < self.TOTAL_LAPS - 15:
+                current = 'light_rain'
+                rain_start = lap
+            elif current in ['light_rain', 'medium_rain', 'heavy_rain']:
+                if (rain_start != -1 and lap - rain_start >= random.randint(min_rain_duration, max_rain_duration)
+                        and random.random() < 0.3):
+                    current = 'dry'
+                    rain_start = -1
+                else:
+                    probs = weather_probs[current]
+                    current = random.choices(list(probs.keys()), weights=list(probs.values()))[0]
+            weather[lap] = current
+        return weather
+
+    def set_strategy(self, car_name, strategy):
+        self.pit_stop_strategies[car_name] = sorted(strategy)
+
+    def run_race_lap_by_lap(self):
+        race_data = []
+        for lap in range(self.TOTAL_LAPS):
+            current_lap_data = []
+            for car in self.cars:
+                if car.is_dnf:
+                    current_lap_data.append({
+                        'name': car.name,
+                        'lap_num': lap + 1,
+                        'total_time': car.total_time,
+                        'status': "❌ Сход",
+                        'is_dnf': True,
+                        'dnf_lap': car.dnf_lap,
+                        'lap_time': 0,
+                        'current_tire': car.current_tire,  # Добавлено
+                        'tire_wear': car.tire_wear  # Добавлено
+                    })
+                    continue
+
+                lap_time = random.uniform(90, 99)
+                pit_time = 0
+                status = '🟢 Обычный круг'
+
+                pit_stop_laps = self.pit_stop_strategies.get(car.name, [])
+
+                if car.tire_age > TIRE_LIFESPAN.get(car.current_tire, 50):
+                    car.is_dnf = True
+                    car.dnf_lap = lap + 1
+                    status = "💥 Взрыв шин! Сход!"
+                    car.total_time += 5000000
+
+                elif car.tire_wear > 95 and not car.emergency_pit_stop_used:
+                    car.current_tire = 'Hard'
+                    car.tire_wear = 0
+                    car.tire_age = 0
+                    pit_time = self.PIT_STOP_EXTRA_TIME_AVG
+                    car.pit_stop_count += 1
+                    car.last_pit_lap = lap
+                    status = "🚨 Аварийный пит-стоп"
+                    car.emergency_pit_stop_used = True
+
+                elif (lap + 1) in pit_stop_laps and lap + 1 != self.TOTAL_LAPS:
+                    pit_stop_idx = pit_stop_laps.index(lap + 1)
+                    stint_laps_remaining = 0
+                    if pit_stop_idx < len(pit_stop_laps) - 1:
+                        stint_laps_remaining = pit_stop_laps[pit_stop_idx + 1] - (lap + 1)
+                    else:
+                        stint_laps_remaining = self.TOTAL_LAPS - (lap + 1)
+
+                    forecast_weather = self.weather_sequence[lap + 1:lap + 1 + stint_laps_remaining]
+
+                    if 'dry' in forecast_weather:
+                        if 'heavy_rain' in forecast_weather or 'medium_rain' in forecast_weather:
+                            car.current_tire = 'Wet'
+                        elif 'light_rain' in forecast_weather:
+                            car.current_tire = 'Intermediate'
+                        else:
+                            car.current_tire = 'Soft'
+                    elif 'light_rain' in forecast_weather:
+                        car.current_tire = 'Intermediate'
+                    else:
+                        car.current_tire = 'Wet'
+
+                    car.tire_wear = 0
+                    car.tire_age = 0
+                    pit_time = self.PIT_STOP_EXTRA_TIME_AVG
+                    car.pit_stop_count += 1
+                    car.last_pit_lap = lap
+                    status = "🔄 Плановый пит-стоп"
+
+                lap_time += self.TIME_PENALTY_PER_PERCENT_WEAR * car.tire_wear
+                penalty_key = (self.weather_sequence[lap], car.current_tire)
+                lap_time += TIRE_MISMATCH_PENALTY.get(penalty_key, 0)
+
+                car.total_time += lap_time + pit_time
+                car.tire_wear += TIRE_WEAR_RATE.get(car.current_tire, 0)
+                car.tire_age += 1
+                car.status = status
+
+                current_lap_data.append({
+                    'name': car.name,
+                    'lap_num': lap + 1,
+                    'total_time': car.total_time,
+                    'status': car.status,
+                    'is_dnf': car.is_dnf,
+                    'dnf_lap': car.dnf_lap,
+                    'lap_time': lap_time + pit_time,
+                    'current_tire': car.current_tire,  # Добавлено
+                    'tire_wear': car.tire_wear  # Добавлено
+                })
+
+            sorted_cars = sorted(self.cars, key=lambda c: c.total_time)
+            for i, c in enumerate(sorted_cars):
+                c.position = i + 1
+
+            race_data.append(current_lap_data)
+
+        return self.cars, race_data
+
+
+class ColumnarRaceEngine(RaceEngine):
+    """RaceEngine с состоянием машин в массивах NumPy и потоковой выдачей кругов."""
+
+    def __init__(self, car_names, random_seed=None):
+        super().__init__(car_names, random_seed)
+        self.rng = np.random.default_rng(self.random_seed)
+
+    def _init_state(self):
+        n_cars = len(self.cars)
+        codes = peremennue.TIRE_CODES
+        self.total_time = np.array([car.total_time for car in self.cars], dtype=float)
+        self.tire = np.array([codes[car.current_tire] for car in self.cars], dtype=np.int8)
+        self.tire_wear = np.array([car.tire_wear for car in self.cars], dtype=float)
+        self.tire_age = np.array([car.tire_age for car in self.cars], dtype=np.int64)
+        self.pit_stop_count = np.array([car.pit_stop_count for car in self.cars], dtype=np.int64)
+        self.is_dnf = np.array([car.is_dnf for car in self.cars], dtype=bool)
+        self.dnf_lap = np.array([car.dnf_lap or 0 for car in self.cars], dtype=np.int64)
+        self.last_pit_lap = np.array([car.last_pit_lap for car in self.cars], dtype=np.int64)
+        self.position = np.array([car.position for car in self.cars], dtype=np.int64)
+        self.emergency_pit_stop_used = np.array([car.emergency_pit_stop_used for car in self.cars], dtype=bool)
+        self.status = np.array([STATUS_CODES.get(car.status, 0) for car in self.cars], dtype=np.int8)
+
+        # Стратегии: отсортированные пит-стопы, дополненные TOTAL_LAPS (= "дальше пит-стопов нет")
+        strategies = [self.pit_stop_strategies.get(car.name, []) for car in self.cars]
+        width = max([len(strategy) for strategy in strategies] + [0]) + 1
+        self.pit_stop_laps = np.full((n_cars, width), self.TOTAL_LAPS, dtype=np.int64)
+        self.is_pit_lap = np.zeros((n_cars, self.TOTAL_LAPS + 1), dtype=bool)
+        for i, strategy in enumerate(strategies):
+            self.pit_stop_laps[i, :len(strategy)] = strategy
+            laps = [lap for lap in strategy if 0 <= lap <= self.TOTAL_LAPS]
+            self.is_pit_lap[i, laps] = True
+
+        self.weather_codes = np.array([peremennue.WEATHER_CODES[w] for w in self.weather_sequence], dtype=np.intp)
+        categories = np.stack([
+            self.weather_codes == peremennue.WEATHER_CODES['dry'],
+            self.weather_codes == peremennue.WEATHER_CODES['light_rain'],
+            self.weather_codes >= peremennue.WEATHER_CODES['medium_rain'],
+        ])
+        self.weather_prefix_counts = np.zeros((3, self.TOTAL_LAPS + 1), dtype=np.int64)
+        np.cumsum(categories, axis=1, out=self.weather_prefix_counts[:, 1:])
+
+    def _forecast_tires(self, cars, lap):
+        """Шины планового пит-стопа по прогнозу на следующий отрезок (то же правило, что в RaceEngine)."""
+        codes = peremennue.TIRE_CODES
+        pit_stop_laps = self.pit_stop_laps[cars]
+        pit_stop_idx = (pit_stop_laps == lap + 1).argmax(axis=1)
+        stint_end = np.clip(pit_stop_laps[np.arange(len(cars)), pit_stop_idx + 1], lap + 1, self.TOTAL_LAPS)
+
+        counts = self.weather_prefix_counts[:, stint_end] - self.weather_prefix_counts[:, [lap + 1]]
+        has_dry, has_light, has_heavy = counts > 0
+        tires = np.where(has_light, codes['Intermediate'], codes['Wet'])
+        tires = np.where(has_dry & ~has_light & ~has_heavy, codes['Soft'], tires)
+        return np.where(has_dry & has_heavy, codes['Wet'], tires)
+
+    def _run_lap(self, lap, record):
+        codes = peremennue.TIRE_CODES
+        running = ~self.is_dnf
+        retired = self.is_dnf.copy()
+
+        lap_time = np.zeros(len(self.cars))
+        lap_time[running] = self.rng.uniform(90, 99, size=int(running.sum()))
+        pit_time = np.zeros(len(self.cars))
+        status = np.zeros(len(self.cars), dtype=np.int8)
+
+        blowout = running & (self.tire_age > peremennue.TIRE_LIFESPAN_TABLE[self.tire])
+        self.is_dnf |= blowout
+        self.dnf_lap[blowout] = lap + 1
+        self.total_time[blowout] += 5000000
+        status[blowout] = STATUS_CODES["💥 Взрыв шин! Сход!"]
+
+        emergency = running & ~blowout & (self.tire_wear > 95) & ~self.emergency_pit_stop_used
+        planned = running & ~blowout & ~emergency & self.is_pit_lap[:, lap + 1] & (lap + 1 != self.TOTAL_LAPS)
+        if planned.any():
+            self.tire[planned] = self._forecast_tires(np.flatnonzero(planned), lap)
+        self.tire[emergency] = codes['Hard']
+        self.emergency_pit_stop_used |= emergency
+        status[emergency] = STATUS_CODES["🚨 Аварийный пит-стоп"]
+        status[planned] = STATUS_CODES["🔄 Плановый пит-стоп"]
+
+        pit = emergency | planned
+        self.tire_wear[pit] = 0
+        self.tire_age[pit] = 0
+        pit_time[pit] = self.PIT_STOP_EXTRA_TIME_AVG
+        self.pit_stop_count += pit
+        self.last_pit_lap[pit] = lap
+
+        lap_time += self.TIME_PENALTY_PER_PERCENT_WEAR * self.tire_wear
+        lap_time += peremennue.TIRE_MISMATCH_PENALTY_TABLE[self.weather_codes[lap], self.tire]
+        lap_time += pit_time
+        lap_time[retired] = 0
+
+        self.total_time[running] += lap_time[running]
+        self.tire_wear[running] += peremennue.TIRE_WEAR_RATE_TABLE[self.tire[running]]
+        self.tire_age += running
+        status[retired] = STATUS_CODES["❌ Сход"]
+        self.status[running] = status[running]
+
+        self.position[np.argsort(self.total_time, kind='stable')] = np.arange(1, len(self.cars) + 1)
+
+        record['total_time'] = self.total_time
+        record['lap_time'] = lap_time
+        record['tire_wear'] = self.tire_wear
+        record['tire'] = self.tire
+        record['status'] = status
+        record['is_dnf'] = self.is_dnf
+        record['dnf_lap'] = self.dnf_lap
+        record['position'] = self.position
+        return record
+
+    def iter_laps(self, out=None):
+        """Runs the race and yields one LAP_RECORD_DTYPE array of all cars per lap.
+
+        With `out` of shape (TOTAL_LAPS, cars) the records are written into it and its rows are yielded;
+        otherwise a fresh array is yielded for every lap.
+        """
+        self._init_state()
+        for lap in range(self.TOTAL_LAPS):
+            record = out[lap] if out is not None else np.empty(len(self.cars), dtype=LAP_RECORD_DTYPE)
+            yield self._run_lap(lap, record)
+        self._sync_cars()
+
+    def run_race_to_array(self):
+        """Runs the race into a preallocated structured array of shape (TOTAL_LAPS, cars)."""
+        records = np.empty((self.TOTAL_LAPS, len(self.cars)), dtype=LAP_RECORD_DTYPE)
+        for _ in self.iter_laps(out=records):
+            pass
+        return records
+
+    def _sync_cars(self):
+        """Copies the array state back into the RaceCar objects."""
+        for i, car in enumerate(self.cars):
+            car.total_time = float(self.total_time[i])
+            car.current_tire = peremennue.TIRE_TYPES[self.tire[i]]
+            car.tire_wear = float(self.tire_wear[i])
+            car.tire_age = int(self.tire_age[i])
+            car.pit_stop_count = int(self.pit_stop_count[i])
+            car.is_dnf = bool(self.is_dnf[i])
+            car.dnf_lap = int(self.dnf_lap[i]) if self.is_dnf[i] else None
+            car.last_pit_lap = int(self.last_pit_lap[i])
+            car.status = LAP_STATUSES[self.status[i]]
+            car.position = int(self.position[i])
+            car.emergency_pit_stop_used = bool(self.emergency_pit_stop_used[i])
+
+    def lap_records_to_dicts(self, lap, records):
+        """Dict view of one lap of records, in the format of RaceEngine.run_race_lap_by_lap."""
+        lap_data = []
+        for car, (total_time, lap_time, tire_wear, tire, status, is_dnf, dnf_lap, _) in zip(self.cars,
+                                                                                           records.tolist()):
+            lap_data.append({
+                'name': car.name,
+                'lap_num': lap + 1,
+                'total_time': total_time,
+                'status': LAP_STATUSES[status],
+                'is_dnf': is_dnf,
+                'dnf_lap': dnf_lap if is_dnf else None,
+                'lap_time': lap_time,
+                'current_tire': peremennue.TIRE_TYPES[tire],
+                'tire_wear': tire_wear
+            })
+        return lap_data
+
+    def run_race_lap_by_lap(self):
+        race_data = [self.lap_records_to_dicts(lap, records) for lap, records in enumerate(self.iter_laps())]
+        return self.cars, race_data
+
+
+def make_race_engine(car_names, random_seed=None):
+    """RaceEngine for small grids, ColumnarRaceEngine from COLUMNAR_MIN_CARS cars on."""
+    engine_class = ColumnarRaceEngine if len(car_names) >= COLUMNAR_MIN_CARS else RaceEngine
+    return engine_class(car_names, random_seed=random_seed)
@@ -0,0 +1,657 @@
+# race_model.py
+
+import bisect
+import hashlib
+import itertools
+import random
+import numpy as np
+import peremennue
+from config import config_editor
+from fitness_cache import FitnessCache
+from stint_checkpoints import StintCheckpointTrie
+from weather_scenarios import RISK_MEASURES, WeatherScenarios, risk_measure
+
+# Состояние симуляции: (следующий круг, total_time, laps_completed, current_tire, tire_wear, tire_age,
+# pit_stop_count, last_pit_lap, emergency_pit_stop_used, старший прочитанный индекс pit_stop_laps)
+INITIAL_STATE = (0, 0, 0, 'Medium', 0, 0, 0, 0, False, -1)
+
+
+class RaceModel:
+    def __init__(self, random_seed=random.randint(1, 100), cache_size=100000, cache_path=None):
+        self.random_seed = random_seed
+        random.seed(self.random_seed)
+
+        # === Параметры гонки ===
+        self.TOTAL_LAPS = config_editor["TOTAL_LAPS"]
+        self.BASE_LAP_TIME = config_editor["BASE_LAP_TIME"]
+        self.TIME_PENALTY_PER_PERCENT_WEAR = config_editor["TIME_PENALTY_PER_PERCENT_WEAR"]
+        self.PIT_STOP_EXTRA_TIME_AVG = config_editor["PIT_STOP_EXTRA_TIME_AVG"]
+        self.REQUIRED_PIT_STOPS = config_editor["REQUIRED_PIT_STOPS"]
+        self.RESERVE_PIT_STOP = config_editor["RESERVE_PIT_STOP"]
+        self.MIN_RAIN_DURATION = config_editor["MIN_RAIN_DURATION"]
+        self.MAX_RAIN_DURATION = config_editor["MAX_RAIN_DURATION"]
+        self.MIN_STINT_LENGTH = config_editor["MIN_STINT_LENGTH"]
+
+        # === Типы шин и их износ ===
+        self.TIRE_TYPES = peremennue.TIRE_TYPES
+        self.TIRE_WEAR_RATE = peremennue.TIRE_WEAR_RATE
+        self.TIRE_LIFESPAN = peremennue.TIRE_LIFESPAN
+
+        # === Штрафы за несоответствие шин и погоды ===
+        self.TIRE_MISMATCH_PENALTY = peremennue.TIRE_MISMATCH_PENALTY
+
+        # === Погода ===
+        self.WEATHER_TYPES = ['dry', 'light_rain', 'medium_rain', 'heavy_rain']
+        self.WEATHER_PROBS_TRANSITION = {
+            'dry': {'dry': 0.85, 'light_rain': 0.15},
+            'light_rain': {'dry': 0.1, 'light_rain': 0.5, 'medium_rain': 0.4},
+            'medium_rain': {'light_rain': 0.2, 'medium_rain': 0.5, 'heavy_rain': 0.3},
+            'heavy_rain': {'medium_rain': 0.4, 'heavy_rain': 0.6}
+        }
+        self.fixed_weather_sequence = self.generate_weather_sequence()
+
+        # === Генератор времени кругов и таблицы для пакетной оценки ===
+        self.rng = np.random.default_rng(self.random_seed)
+        self._weather_encoding = (None, None)
+        self._event_ages = self._stint_event_ages()
+        self._penalty_tables = self._lap_penalty_tables()
+        self._forecast_tables = (None, None)
+        self._workspace_buffers = None
+
+        # === Контрольные точки отрезков для инкрементальной оценки ===
+        self.checkpoints = StintCheckpointTrie()
+        self._checkpoint_lap_times = None
+
+        # === Кэш оценок стратегий (cache_size=0 отключает) ===
+        self.cache_path = cache_path
+        self.cache = FitnessCache(cache_size, self.config_fingerprint()) if cache_size else None
+        if self.cache is not None and self.cache_path:
+            self.cache.load(self.cache_path)
+
+    def config_fingerprint(self):
+        """Fingerprint of the race parameters and tire tables a fitness value depends on (see FitnessCache)."""
+        parameters = sorted((name, value) for name, value in vars(self).items() if name.isupper())
+        tables = [getattr(peremennue, name).tolist() for name in
+                  ('TIRE_WEAR_RATE_TABLE', 'TIRE_LIFESPAN_TABLE', 'TIRE_MISMATCH_PENALTY_TABLE')]
+        return FitnessCache.config_fingerprint(parameters, tables)
+
+    def generate_weather_sequence(self):
+        weather = ['dry'] * self.TOTAL_LAPS
+        current = 'dry'
+        rain_start = -1
+        for lap in range(self.TOTAL_LAPS):
+            if current == 'dry' and random.random() < 0.05 and lap < self.TOTAL_LAPS - 15:
+                current = 'light_rain'
+                rain_start = lap
+            elif current in ['light_rain', 'medium_rain', 'heavy_rain']:
+                if (rain_start != -1 and lap - rain_start >= random.randint(self.MIN_RAIN_DURATION,
+                                                                            self.MAX_RAIN_DURATION)
+                        and random.random() < 0.3):
+                    current = 'dry'
+                    rain_start = -1
+                else:
+                    probs = self.WEATHER_PROBS_TRANSITION[current]
+                    current = random.choices(list(probs.keys()), weights=list(probs.values()))[0]
+            weather[lap] = current
+        return weather
+
+    def _get_optimal_tire(self, weather_condition):
+        optimal_tires = {
+            'dry': 'Soft',
+            'light_rain': 'Intermediate',
+            'medium_rain': 'Wet',
+            'heavy_rain': 'Wet'
+        }
+        return optimal_tires.get(weather_condition, 'Soft')
+
+    def _run_simulation(self, individual, lap_times=None, collect_laps=True):
+        pit_stop_laps = sorted(individual)
+        state, is_dnf, lap_data = self._simulate_laps(pit_stop_laps, INITIAL_STATE, lap_times, collect_laps)
+        total_time = self._final_time(state, is_dnf)
+        return total_time, state[6], is_dnf, lap_data if collect_laps else None
+
+    def _simulate_laps(self, pit_stop_laps, state, lap_times=None, collect_laps=True, on_pit_stop=None):
+        """Simulates laps from the state's lap to the finish or a DNF; returns (state, is_dnf, lap_data).
+
+        on_pit_stop(state) is called at the start of every planned pit-stop lap, before the stop.
+        """
+        (start_lap, total_time, laps_completed, current_tire, tire_wear, tire_age, pit_stop_count, last_pit_lap,
+         emergency_pit_stop_used, forecast_index) = state
+        is_dnf = False
+
+        weather = self.fixed_weather_sequence
+
+        lap_data = []
+
+        next_lap = self.TOTAL_LAPS
+        for lap in range(start_lap, self.TOTAL_LAPS):
+            current_weather = weather[lap]
+            lap_time = 0
+            pit_time = 0
+            status = ''
+
+            is_pit_stop_lap = (lap + 1) in pit_stop_laps
+            if is_pit_stop_lap and on_pit_stop is not None:
+                on_pit_stop((lap, total_time, laps_completed, current_tire, tire_wear, tire_age, pit_stop_count,
+                             last_pit_lap, emergency_pit_stop_used, forecast_index))
+
+            # Логика экстренного пит-стопа имеет приоритет
+            if tire_wear > 95 and not emergency_pit_stop_used:
+                current_tire = 'Hard'
+                tire_wear = 0
+                tire_age = 0
+                pit_time = self.PIT_STOP_EXTRA_TIME_AVG
+                pit_stop_count += 1
+                last_pit_lap = lap
+                status = "🚨 Аварийный пит-стоп"
+                emergency_pit_stop_used = True
+                emergency_pit_stop_triggered = True
+
+            # Логика планового пит-стопа
+            if is_pit_stop_lap:
+                pit_stop_count += 1
+                pit_time = self.PIT_STOP_EXTRA_TIME_AVG
+
+                if pit_stop_count - 1 < len(pit_stop_laps):
+                    forecast_index = max(forecast_index, pit_stop_count - 1)
+                next_stint_length = (pit_stop_laps[pit_stop_count - 1] if pit_stop_count - 1 < len(
+                    pit_stop_laps) else self.TOTAL_LAPS) - lap
+
+                forecast_weather = weather[lap:lap + next_stint_length]
+
+                if 'dry' in forecast_weather:
+                    if 'heavy_rain' in forecast_weather or 'medium_rain' in forecast_weather:
+                        current_tire = 'Wet'
+                    elif 'light_rain' in forecast_weather:
+                        current_tire = 'Intermediate'
+                    else:
+                        current_tire = 'Soft'
+                elif 'light_rain' in forecast_weather:
+                    current_tire = 'Intermediate'
+                else:
+                    current_tire = 'Wet'
+
+                tire_wear = 0
+                tire_age = 0
+                last_pit_lap = lap
+                status = "🔄 Плановый пит-стоп"
+
+            # Проверка на взрыв
+            if tire_age > self.TIRE_LIFESPAN.get(current_tire, 50):
+                is_dnf = True
+                status = "💥 Взрыв шин! Сход!"
+                next_lap = lap + 1
+                break
+
+            # Динамическое время круга (90-99 секунд)
+            lap_time = random.uniform(90, 99) if lap_times is None else lap_times[lap]
+
+            # Штраф за износ
+            lap_time += self.TIME_PENALTY_PER_PERCENT_WEAR * tire_wear
+
+            # Штраф за несоответствие шин
+            penalty_key = (current_weather, current_tire)
+            lap_time += self.TIRE_MISMATCH_PENALTY.get(penalty_key, 0)
+
+            # Увеличение износа и возраста шин
+            tire_wear += self.TIRE_WEAR_RATE.get(current_tire, 0)
+            tire_age += 1
+
+            # Проверка на перегрев (ужесточено)
+            if tire_wear >= 100:
+                is_dnf = True
+                status = "💥 Перегрев шин! Сход!"
+                next_lap = lap + 1
+                break
+
+            total_time += lap_time + pit_time
+            laps_completed += 1
+
+            if not collect_laps:
+                continue
+
+            lap_data.append({
+                'lap_num': lap + 1,
+                'weather': current_weather,
+                'tire_type': current_tire,
+                'tire_wear': tire_wear,
+                'tire_age': tire_age,
+                'lap_time': lap_time,
+                'pit_time': pit_time,
+                'total_time': total_time,
+                'pit_stops_count': pit_stop_count,
+                'status': status if status else '🟢 Обычный круг'
+            })
+
+        state = (next_lap, total_time, laps_completed, current_tire, tire_wear, tire_age, pit_stop_count,
+                 last_pit_lap, emergency_pit_stop_used, forecast_index)
+        return state, is_dnf, lap_data
+
+    def _final_time(self, state, is_dnf):
+        """Race time of a finished simulation state with the DNF and pit-stop rule penalties."""
+        _, total_time, laps_completed, _, _, _, pit_stop_count, _, emergency_pit_stop_used, _ = state
+
+        # Увеличенные штрафы за несоблюдение правил
+        if is_dnf:
+            # Штраф в зависимости от того, сколько кругов пройдено
+            # Чем больше кругов, тем меньше штраф
+            penalty = 5000000 - (10000 * laps_completed)
+            if penalty < 0:
+                penalty = 0
+            total_time += penalty
+
+        final_pit_stop_target = self.REQUIRED_PIT_STOPS
+        if emergency_pit_stop_used:
+            final_pit_stop_target += 1
+
+        if pit_stop_count != final_pit_stop_target:
+            total_time += 15000 * abs(pit_stop_count - final_pit_stop_target)
+
+        return total_time
+
+    def _cache_key(self, individual, weather_key):
+        return self.cache.make_key(individual, weather_key, self.random_seed)
+
+    @staticmethod
+    def _pit_stop_array(individuals):
+        """Sorted pit laps of a population (list of chromosomes or 2-D array) as an int64 (individuals, genes) array."""
+        if isinstance(individuals, np.ndarray):
+            pit_stop_laps = individuals.astype(np.int64)
+        else:
+            pit_stop_laps = np.fromiter(itertools.chain.from_iterable(individuals), dtype=np.int64)
+        return np.sort(pit_stop_laps.reshape(len(individuals), -1), axis=1)
+
+    def evaluate_strategy(self, individual):
+        if self.cache is None:
+            total_time, _, _, _ = self._run_simulation(individual, collect_laps=False)
+            return total_time,
+
+        key = self._cache_key(individual, FitnessCache.weather_key(self.fixed_weather_sequence))
+        total_time = self.cache.get(key)
+        if total_time is None:
+            total_time, _, _, _ = self._run_simulation(individual, collect_laps=False)
+            self.cache.put(key, total_time)
+        return total_time,
+
+    def save_cache(self):
+        if self.cache is not None and self.cache_path:
+            self.cache.save(self.cache_path)
+
+    def _encode_weather(self, weather):
+        """Returns weather codes and prefix counts of dry / light rain / medium-or-heavy rain laps."""
+        key = tuple(weather)
+        if self._weather_encoding[0] == key:
+            return self._weather_encoding[1]
+
+        weather_codes = np.array([peremennue.WEATHER_CODES[w] for w in weather], dtype=np.int8)
+        categories = np.stack([
+            weather_codes == peremennue.WEATHER_CODES['dry'],
+            weather_codes == peremennue.WEATHER_CODES['light_rain'],
+            weather_codes >= peremennue.WEATHER_CODES['medium_rain'],
+        ])
+        prefix_counts = np.zeros((3, len(weather) + 1), dtype=np.int32)
+        np.cumsum(categories, axis=1, out=prefix_counts[:, 1:])
+        self._weather_encoding = key, (weather_codes, prefix_counts)
+        return weather_codes, prefix_counts
+
+    def _stint_event_ages(self):
+        """Stint age (laps on a fresh tire) of an emergency stop and of a DNF (overheat or blowout) per tire."""
+        never = self.TOTAL_LAPS + 1
+        ages = np.arange(self.TOTAL_LAPS + 2)
+        wear_rate = peremennue.TIRE_WEAR_RATE_TABLE
+        # Износ накапливается последовательным сложением, как в _run_simulation
+        wear_at = np.zeros((len(wear_rate), len(ages)))
+        np.cumsum(np.repeat(wear_rate[:, None], len(ages) - 1, axis=1), axis=1, out=wear_at[:, 1:])
+
+        def first_age(condition):
+            return np.where(condition.any(axis=1), condition.argmax(axis=1), never)
+
+        k_emergency = first_age(wear_at > 95)
+        k_overheat = first_age(wear_at[:, 1:] >= 100)
+        k_blowout = first_age(ages[None, :] > peremennue.TIRE_LIFESPAN_TABLE[:, None])
+        return k_emergency, np.minimum(k_overheat, k_blowout)
+
+    @staticmethod
+    def _forecast_rule(has_dry, has_light, has_heavy):
+        """Tire codes chosen for forecast windows with / without dry, light and medium-or-heavy rain laps."""
+        codes = peremennue.TIRE_CODES
+        tires = np.where(has_light, codes['Intermediate'], codes['Wet'])
+        tires = np.where(has_dry & ~has_light & ~has_heavy, codes['Soft'], tires)
+        return np.where(has_dry & has_heavy, codes['Wet'], tires)
+
+    def _forecast_table(self, prefix_counts):
+        """Forecast tire of every window [start, end) of one weather sequence, shape (laps + 1, laps + 1)."""
+        if self._forecast_tables[0] is not prefix_counts:
+            has_dry, has_light, has_heavy = (prefix_counts[:, None, :] - prefix_counts[:, :, None]) > 0
+            self._forecast_tables = prefix_counts, self._forecast_rule(has_dry, has_light, has_heavy)
+        return self._forecast_tables[1]
+
+    def _forecast_tires(self, stint_ends, laps, prefix_counts):
+        """Vectorized forecast-based tire choice of planned pit stops at `laps` for stints planned to end at
+        stint_ends (same rule as _run_simulation)."""
+        stint_end = np.maximum(stint_ends, laps)
+        if prefix_counts.ndim == 2:
+            return self._forecast_table(prefix_counts)[laps, stint_end]
+        # Своя погода у каждой строки: prefix_counts имеет форму (rows, 3, laps + 1)
+        rows = np.arange(len(laps))
+        return self._forecast_rule(*((prefix_counts[rows, :, stint_end] - prefix_counts[rows, :, laps]).T > 0))
+
+    def _lap_penalty_tables(self):
+        """Flat wear and tire-mismatch penalty tables of the lap-time pass of _simulate_population.
+
+        Returns (age_bits, wear_penalty, mismatch_penalty): wear_penalty[(tire << age_bits) + TOTAL_LAPS + age]
+        and mismatch_penalty[(weather << 3) + tire].
+        """
+        age_bits = (2 * self.TOTAL_LAPS).bit_length()
+        ages = np.arange(self.TOTAL_LAPS + 1)
+        wear_penalty = np.zeros((8, 1 << age_bits))
+        # Износ кратен темпу износа, поэтому произведение совпадает с последовательной суммой
+        rates = peremennue.TIRE_WEAR_RATE_TABLE
+        wear_penalty[:len(rates), self.TOTAL_LAPS:2 * self.TOTAL_LAPS + 1] = (
+            rates[:, None] * ages[None, :] * self.TIME_PENALTY_PER_PERCENT_WEAR)
+        mismatch_penalty = np.zeros((len(peremennue.WEATHER_TYPES), 8))
+        mismatch_penalty[:, :len(rates)] = peremennue.TIRE_MISMATCH_PENALTY_TABLE
+        return age_bits, wear_penalty.ravel(), mismatch_penalty.ravel()
+
+    def _workspace(self, population_size):
+        """Flat scratch buffers for _simulate_population, reused between generations instead of reallocated."""
+        size = self.TOTAL_LAPS * population_size
+        if self._workspace_buffers is None or self._workspace_buffers[0].size < size:
+            self._workspace_buffers = (np.empty(size, dtype=np.intp), np.empty(size, dtype=np.intp),
+                                       np.empty(size), np.empty(size))
+        return self._workspace_buffers
+
+    def _simulate_population(self, individuals, lap_times=None, weather=None):
+        """Vectorized counterpart of _run_simulation: returns (total_time, pit_stop_count, is_dnf) arrays.
+
+        Within a stint the tire state depends only on the stint age, so the population is advanced
+        stint by stint (at most REQUIRED_PIT_STOPS + 2 steps) and lap times are then computed as
+        (laps, population) arrays, only up to the last lap any individual completes.
+
+        `weather` is (weather_codes, prefix_counts) as returned by _encode_weather, or per-row arrays of
+        shape (population, laps) and (population, 3, laps + 1); by default fixed_weather_sequence is used.
+        """
+        population_size = len(individuals)
+        total_laps = self.TOTAL_LAPS
+        never = total_laps + 1
+        pit_stop_laps = self._pit_stop_array(individuals)
+        # Пит-стоп на круге N меняет шины в начале круга с индексом N - 1
+        pit_lap_idx = np.where((pit_stop_laps >= 1) & (pit_stop_laps <= total_laps), pit_stop_laps - 1, never)
+
+        if weather is None:
+            weather = self._encode_weather(self.fixed_weather_sequence)
+        weather_codes, prefix_counts = weather
+        per_row_weather = prefix_counts.ndim == 3
+        k_emergency, k_dnf_by_tire = self._event_ages
+
+        current_tire = np.full(population_size, peremennue.TIRE_CODES['Medium'])
+        pit_stop_count = np.zeros(population_size, dtype=np.int64)
+        is_dnf = np.zeros(population_size, dtype=bool)
+        race_end = np.full(population_size, total_laps)
+
+        # Прогноз при пит-стопе номер n смотрит до n-го пит-круга, после всех плановых - до финиша
+        forecast_ends = np.full((population_size, pit_stop_laps.shape[1] + 1), total_laps)
+        np.minimum(pit_stop_laps, total_laps, out=forecast_ends[:, :-1])
+        pit_laps, pit_rows = [], []
+
+        # Плановый пит-стоп на первом круге
+        planned = (pit_lap_idx == 0).any(axis=1)
+        if planned.any():
+            pit_stop_count += planned
+            rows = np.flatnonzero(planned)
+            pit_rows.append(rows)
+            pit_laps.append(np.zeros(len(rows), dtype=np.int64))
+            current_tire[rows] = self._forecast_tires(
+                forecast_ends[rows, pit_stop_count[rows] - 1], pit_laps[-1],
+                prefix_counts[rows] if per_row_weather else prefix_counts)
+        # Начала отрезков: (круг, строка, шины) с первого круга и после каждой смены шин
+        stint_laps = [np.zeros(population_size, dtype=np.int64)]
+        stint_rows = [np.arange(population_size)]
+        stint_tires = [current_tire]
+        dnf_rows, dnf_laps, emergency_rows = [], [], []
+
+        # Состояние особей, которые ещё едут, хранится сжатым по строкам pending; события - в номерах кругов
+        pending, start, tire = stint_rows[0], stint_laps[0], current_tire
+        upcoming, count = pit_lap_idx, pit_stop_count.copy()
+        emergency_used = np.zeros(population_size, dtype=bool)
+        while len(pending):
+            planned_lap = np.minimum.reduce(np.where(upcoming > start[:, None], upcoming, total_laps), axis=1)
+            emergency_lap = np.where(emergency_used, never, start + k_emergency[tire])
+            reset_lap = np.minimum(planned_lap, emergency_lap)
+            dnf_lap = start + k_dnf_by_tire[tire]
+
+            # Сход (взрыв или перегрев) раньше следующей смены шин
+            dnf = (dnf_lap < reset_lap) & (dnf_lap < total_laps)
+            dnf_rows.append(pending[dnf])
+            dnf_laps.append(dnf_lap[dnf])
+
+            reset = ~dnf & (reset_lap < total_laps)
+            pending, lap = pending[reset], reset_lap[reset]
+            emergency = emergency_lap[reset] == lap
+            planned = planned_lap[reset] == lap
+
+            count = count[reset] + emergency + planned
+            pit_stop_count[pending] = count
+            emergency_used = emergency_used[reset] | emergency
+            emergency_rows.append(pending[emergency])
+            upcoming = upcoming[reset]
+            tire = np.full(len(pending), peremennue.TIRE_CODES['Hard'])
+            rows = pending[planned]
+            tire[planned] = self._forecast_tires(
+                forecast_ends[rows, count[planned] - 1], lap[planned],
+                prefix_counts[rows] if per_row_weather else prefix_counts)
+
+            start = lap
+            stint_laps.append(lap)
+            stint_rows.append(pending)
+            stint_tires.append(tire)
+        pit_laps += stint_laps[1:]
+        pit_rows += stint_rows[1:]
+        dnf_rows = np.concatenate(dnf_rows)
+        is_dnf[dnf_rows] = True
+        race_end[dnf_rows] = np.concatenate(dnf_laps)
+        emergency_pit_stop_used = np.zeros(population_size, dtype=bool)
+        emergency_pit_stop_used[np.concatenate(emergency_rows)] = True
+
+        # Дальше всё считается на месте по массивам (laps, population) до последнего пройденного круга
+        horizon = int(race_end.max())
+        laps = np.arange(horizon)[:, None]
+        stint_marks, penalty_idx, lap_time, scratch = (
+            buffer[:horizon * population_size].reshape(horizon, population_size) for buffer in self._workspace(
+                population_size))
+
+        # Отрезок с круга start на шинах tire кодируется как (tire << age_bits) | (TOTAL_LAPS - start): плюс номер
+        # круга это индекс (tire, TOTAL_LAPS + возраст отрезка) в таблице штрафа за износ
+        age_bits, wear_penalty, mismatch_penalty = self._penalty_tables
+        stint_laps, stint_rows = np.concatenate(stint_laps), np.concatenate(stint_rows)
+        stint_codes = (np.concatenate(stint_tires) << age_bits) | (total_laps - stint_laps)
+        # По особям (внутри особи отрезки уже идут по кругам) каждый отрезок тянется до начала следующего
+        # отрезка той же особи или до горизонта: коды кругов получаются одним np.repeat по строкам особей
+        order = np.argsort(stint_rows, kind='stable')
+        stint_laps, stint_rows, stint_codes = stint_laps[order], stint_rows[order], stint_codes[order]
+        stint_ends = np.full(len(stint_laps), horizon)
+        np.copyto(stint_ends[:-1], stint_laps[1:], where=stint_rows[1:] == stint_rows[:-1])
+        np.copyto(stint_marks, np.repeat(stint_codes, stint_ends - stint_laps).reshape(population_size, horizon).T)
+
+        np.add(stint_marks, laps, out=penalty_idx)
+        np.take(wear_penalty, penalty_idx, out=lap_time, mode='clip')
+        if lap_times is None:
+            # То же, что rng.uniform(90, 99), но без выделения новой памяти
+            self.rng.random(out=scratch)
+            scratch *= 9
+            scratch += 90
+            lap_time += scratch
+        else:
+            lap_time += np.asarray(lap_times).T[:horizon]
+
+        np.right_shift(stint_marks, age_bits, out=penalty_idx)
+        if per_row_weather:
+            penalty_idx += weather_codes.T[:horizon].astype(np.intp) << 3
+        else:
+            penalty_idx += weather_codes[:horizon].astype(np.intp)[:, None] << 3
+        lap_time += np.take(mismatch_penalty, penalty_idx, out=scratch, mode='clip')
+        if pit_laps:
+            lap_time[np.concatenate(pit_laps), np.concatenate(pit_rows)] += self.PIT_STOP_EXTRA_TIME_AVG
+        # Круги после схода не считаются; до самого раннего схода маска не нужна
+        first_end = int(race_end.min())
+        lap_time[first_end:] *= laps[first_end:] < race_end
+        # Сумма по оси кругов накапливается построчно, как и в скалярной симуляции
+        total_time = lap_time.sum(axis=0)
+
+        dnf_penalty = np.maximum(5000000 - 10000 * race_end, 0)
+        total_time = np.where(is_dnf, total_time + dnf_penalty, total_time)
+
+        final_pit_stop_target = self.REQUIRED_PIT_STOPS + emergency_pit_stop_used
+        pit_stop_mismatch = np.abs(pit_stop_count - final_pit_stop_target)
+        total_time = np.where(pit_stop_mismatch != 0, total_time + 15000 * pit_stop_mismatch, total_time)
+
+        return total_time, pit_stop_count, is_dnf
+
+    def _evaluate_cached(self, population, weather_key, simulate):
+        """Looks population up in the cache and scores only the unique misses with simulate(pit_stop_laps)."""
+        pit_stop_laps = self._pit_stop_array(population)
+        keys = self.cache.make_keys(pit_stop_laps, weather_key, self.random_seed)
+        total_time = np.array(self.cache.get_many(keys), dtype=float)
+
+        missing_rows = np.flatnonzero(np.isnan(total_time)).tolist()
+        if missing_rows:
+            # Повторяющиеся промахи внутри поколения симулируются один раз и считаются попаданиями
+            missing_keys = list(map(keys.__getitem__, missing_rows))
+            rows = dict(zip(missing_keys, missing_rows))
+            self.cache.misses -= len(missing_rows) - len(rows)
+            self.cache.hits += len(missing_rows) - len(rows)
+            simulated = simulate(pit_stop_laps[list(rows.values())]).tolist()
+            self.cache.put_many(rows, simulated)
+            simulated = dict(zip(rows, simulated))
+            total_time[missing_rows] = list(map(simulated.get, missing_keys))
+        return total_time
+
+    def evaluate_population(self, population, lap_times=None):
+        """Scores a whole population in one vectorized pass and returns an array of total race times."""
+        if len(population) == 0:
+            return np.empty(0)
+        if self.cache is None or lap_times is not None:
+            total_time, _, _ = self._simulate_population(population, lap_times)
+            return total_time
+
+        weather_key = FitnessCache.weather_key(self.fixed_weather_sequence)
+        return self._evaluate_cached(population, weather_key,
+                                     lambda individuals: self._simulate_population(individuals)[0])
+
+    def _run_incremental(self, individual, lap_times):
+        """_run_simulation(individual, lap_times) resumed from the latest checkpoint of a shared pit-lap prefix."""
+        pit_stop_laps = sorted(individual)
+        state = self.checkpoints.lookup(pit_stop_laps) or INITIAL_STATE
+        start_lap = state[0]
+
+        def on_pit_stop(checkpoint):
+            if checkpoint[0] == start_lap:
+                return
+            # Состояние до пит-стопа зависит от всех пит-кругов не позже текущего и от прочитанных прогнозом
+            depth = max(bisect.bisect_right(pit_stop_laps, checkpoint[0] + 1), checkpoint[-1] + 1)
+            self.checkpoints.insert(pit_stop_laps, depth, checkpoint)
+
+        state, is_dnf, _ = self._simulate_laps(pit_stop_laps, state, lap_times, collect_laps=False,
+                                               on_pit_stop=on_pit_stop)
+        self.checkpoints.record(start_lap, state[0])
+        return self._final_time(state, is_dnf)
+
+    def evaluate_incremental(self, population, lap_times=None):
+        """Scores a population with the scalar simulation, re-simulating only the laps after the shared prefix.
+
+        All individuals run on the same lap-time draws (by default one row drawn from self.rng on first use),
+        so a child resumed from a checkpoint gets exactly the time of a full _run_simulation.
+        Resuming saves laps only against the scalar path: evaluate_population simulates the whole
+        population in one batch and is several times faster.
+        """
+        if len(population) == 0:
+            return np.empty(0)
+        if lap_times is None:
+            if self._checkpoint_lap_times is None:
+                self._checkpoint_lap_times = self.rng.uniform(90, 99, size=self.TOTAL_LAPS)
+            lap_times = self._checkpoint_lap_times
+        lap_times = np.asarray(lap_times, dtype=float)
+        weather_key = FitnessCache.weather_key(self.fixed_weather_sequence)
+        context = f"{weather_key}:{hashlib.sha1(lap_times.tobytes()).hexdigest()[:16]}"
+        self.checkpoints.bind(context)
+        lap_times = lap_times.tolist()
+
+        def simulate(individuals):
+            return np.array([self._run_incremental(individual, lap_times) for individual in
+                             (individuals.tolist() if isinstance(individuals, np.ndarray) else individuals)])
+
+        if self.cache is None:
+            return simulate(population)
+        return self._evaluate_cached(population, context, simulate)
+
+    def generate_weather_scenarios(self, n_scenarios, rng=None):
+        """Samples n_scenarios weather sequences at once with the rules of generate_weather_sequence.
+
+        Returns WeatherScenarios with int8 weather codes of shape (n_scenarios, TOTAL_LAPS) and matching
+        lap-time draws, vectorized over scenarios instead of the per-lap random.choices loop.
+        """
+        rng = self.rng if rng is None else rng
+        codes = peremennue.WEATHER_CODES
+        transition = np.zeros((len(codes), len(codes)))
+        for current, probs in self.WEATHER_PROBS_TRANSITION.items():
+            for following, prob in probs.items():
+                transition[codes[current], codes[following]] = prob
+        # Накопленные веса как в random.choices: следующее состояние = число границ <= u
+        cum_weights = np.cumsum(transition, axis=1)
+        cum_weights /= cum_weights[:, -1:]
+        cum_weights[:, -1] = np.inf
+
+        weather = np.empty((n_scenarios, self.TOTAL_LAPS), dtype=np.int8)
+        current = np.full(n_scenarios, codes['dry'], dtype=np.int8)
+        rain_start = np.full(n_scenarios, -1)
+        for lap in range(self.TOTAL_LAPS):
+            u_start, u_stop, u_next = rng.random((3, n_scenarios))
+            rain_duration = rng.integers(self.MIN_RAIN_DURATION, self.MAX_RAIN_DURATION, size=n_scenarios,
+                                         endpoint=True)
+
+            is_dry = current == codes['dry']
+            start_rain = is_dry & (u_start < 0.05) & (lap < self.TOTAL_LAPS - 15)
+            stop_rain = (~is_dry & (rain_start != -1) & (lap - rain_start >= rain_duration) & (u_stop < 0.3))
+            step = ~is_dry & ~stop_rain
+            following = (cum_weights[current] <= u_next[:, None]).sum(axis=1)
+
+            current = np.where(step, following, current)
+            current[start_rain] = codes['light_rain']
+            current[stop_rain] = codes['dry']
+            rain_start[start_rain] = lap
+            rain_start[stop_rain] = -1
+            weather[:, lap] = current
+
+        lap_times = rng.uniform(90, 99, size=(n_scenarios, self.TOTAL_LAPS))
+        return WeatherScenarios(weather, lap_times)
+
+    def _simulate_scenarios(self, individuals, scenarios, risk, alpha, chunk_rows):
+        """Race times of every (individual, scenario) pair aggregated with risk_measure."""
+        n_scenarios = len(scenarios)
+        pit_stop_laps = self._pit_stop_array(individuals)
+        group = max(1, chunk_rows // n_scenarios)
+
+        fitness = np.empty(len(individuals))
+        for first in range(0, len(individuals), group):
+            chunk = pit_stop_laps[first:first + group]
+            # Строки упорядочены (особь, сценарий); у всех особей одинаковые сценарии и времена кругов
+            rows = np.repeat(chunk, n_scenarios, axis=0)
+            scenario_idx = np.tile(np.arange(n_scenarios), len(chunk))
+            weather = scenarios.weather[scenario_idx], scenarios.prefix_counts[scenario_idx]
+            total_time, _, _ = self._simulate_population(rows, scenarios.lap_times[scenario_idx], weather)
+            fitness[first:first + group] = risk_measure(total_time.reshape(len(chunk), n_scenarios).T, risk, alpha)
+        return fitness
+
+    def evaluate_robust(self, population, scenarios, risk='mean', alpha=0.9, chunk_rows=8192):
+        """Scores a population against every weather scenario; risk is 'mean', 'percentile' or 'cvar'."""
+        if risk not in RISK_MEASURES:
+            raise ValueError(f"Unknown risk measure {risk!r}, expected one of {RISK_MEASURES}")
+        if len(population) == 0:
+            return np.empty(0)
+
+        def simulate(individuals):
+            return self._simulate_scenarios(individuals, scenarios, risk, alpha, chunk_rows)
+
+        if self.cache is None:
+            return simulate(population)
+        return self._evaluate_cached(population, f"{scenarios.key}:{risk}:{alpha}", simulate)
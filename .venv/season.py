@@ -0,0 +1,115 @@
+# season.py
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from agent_ga import iter_agent_strategies
+from leaderboard_manager import get_results_store, race_result
+from race_engine import ColumnarRaceEngine, make_race_engine
+from race_model import RaceModel
+from strategy_solver import StrategySolver
+
+
+def find_strategies(engine, car_names, solver="ga", workers=None, verbose=False):
+    """Pit-stop strategy of every agent: its own GA search or the shared DP optimum for the race weather."""
+    strategies = {}
+    if solver == "dp":
+        if verbose:
+            print("Шаг 1: Оптимальная стратегия рассчитывается динамическим программированием...")
+        # RaceModel пересевает random, поэтому состояние гонки сохраняется и восстанавливается
+        race_random_state = random.getstate()
+        model = RaceModel(engine.random_seed, cache_size=0)
+        random.setstate(race_random_state)
+        model.fixed_weather_sequence = engine.weather_sequence
+
+        best_strategy, expected_time = StrategySolver(model).solve()
+        if verbose:
+            print(f"✅ Оптимальная стратегия - {best_strategy}, ожидаемое время {expected_time:.2f} сек.")
+        for name in car_names:
+            strategies[name] = list(best_strategy)
+    else:
+        if verbose:
+            print("Шаг 1: Каждая нейросеть разрабатывает свою стратегию...")
+        found = {}
+        for name, best_strategy in iter_agent_strategies(car_names, engine, workers=workers):
+            found[name] = best_strategy
+            if verbose:
+                print(f"✅ {name}: Стратегия найдена - {best_strategy}")
+        strategies = {name: found[name] for name in car_names}
+    return strategies
+
+
+def best_lap_times(engine, records):
+    """Best lap of every car from ColumnarRaceEngine records (laps after retirement are skipped)."""
+    lap_times = np.where(records['is_dnf'] | (records['lap_time'] <= 0), np.inf, records['lap_time'])
+    best = lap_times.min(axis=0)
+    return {car.name: float(lap) if np.isfinite(lap) else None for car, lap in zip(engine.cars, best)}
+
+
+def history_best_lap_times(race_history):
+    """Best lap of every car from the per-lap dicts of run_race_lap_by_lap (laps after retirement are skipped)."""
+    best = {}
+    for lap_data in race_history:
+        for car_data in lap_data:
+            lap_time = car_data.get('lap_time')
+            if not car_data['is_dnf'] and lap_time and lap_time < best.get(car_data['name'], float('inf')):
+                best[car_data['name']] = lap_time
+    return best
+
+
+def run_race(seed, car_names, solver="ga"):
+    """Runs one seeded race without the GUI and returns its results-log record."""
+    # Движок выбирается как в main.py: тот же сид даёт ту же гонку
+    engine = make_race_engine(car_names, random_seed=seed)
+    # Гонки сезона уже распределены по процессам, агенты внутри гонки считаются последовательно
+    strategies = find_strategies(engine, car_names, solver, workers=1)
+    for name, strategy in strategies.items():
+        engine.set_strategy(name, strategy)
+    if isinstance(engine, ColumnarRaceEngine):
+        best_laps = best_lap_times(engine, engine.run_race_to_array())
+    else:
+        _, race_history = engine.run_race_lap_by_lap()
+        best_laps = history_best_lap_times(race_history)
+    return race_result(engine, strategies, best_laps)
+
+
+def iter_season(seeds, car_names, solver="ga", workers=None):
+    """Runs a race for every seed in a process pool and yields the results as they finish."""
+    seeds = list(seeds)
+    workers = min(workers or os.cpu_count() or 1, max(len(seeds), 1))
+    if workers <= 1:
+        for seed in seeds:
+            yield run_race(seed, car_names, solver)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_race, seed, car_names, solver) for seed in seeds]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run_season(seeds, car_names, solver="ga", workers=None, store=None):
+    """Streams every race of the season into the results log and prints the season summary."""
+    store = store or get_results_store()
+    seeds = list(seeds)
+    start = time.perf_counter()
+    for i, race in enumerate(iter_season(seeds, car_names, solver, workers), start=1):
+        store.append(race)
+        winner = race['winner'] or "все сошли"
+        print(f"Гонка {i}/{len(seeds)} (сид {race['seed']}): победитель {winner}")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n🏁 Сезон завершён: {len(seeds)} гонок за {elapsed:.1f} сек, всего в журнале {store.race_count()}.")
+    print("\nПобеды по агентам:")
+    for name, wins in store.win_counts().items():
+        print(f"  {name}: {wins}")
+    print("\nСамые успешные стратегии:")
+    for key, wins in list(store.win_counts(by='strategy').items())[:5]:
+        stats = store.strategy_stats(key)
+        mean_best_lap = stats['best_lap_sum'] / stats['best_lap_count'] if stats['best_lap_count'] else float('nan')
+        print(f"  {stats['strategy']}: побед {wins} из {stats['starts']} стартов, "
+              f"средний лучший круг {mean_best_lap:.2f} сек")
+    return store
@@ -0,0 +1,75 @@
+# stint_checkpoints.py
+
+
+class StintCheckpointTrie:
+    """Prefix trie of simulation states saved at pit-stop boundaries, keyed by the sorted pit laps.
+
+    A state stored at depth d is the state at the start of a planned pit-stop lap and depends only on
+    the first d pit laps, so every chromosome sharing that prefix can resume the simulation from it.
+    """
+
+    def __init__(self, max_nodes=200000):
+        self.max_nodes = max_nodes
+        self.context = None
+        # Корни отдельные для каждой длины хромосомы; узел - [дети, состояние]
+        self.roots = {}
+        self.nodes = 0
+        self.laps_simulated = 0
+        self.laps_skipped = 0
+        self.resumed = 0
+        self.resets = 0
+
+    def bind(self, context):
+        """Drops all checkpoints when the weather or lap-time draws they were simulated with change."""
+        if context != self.context:
+            self.clear()
+            self.context = context
+
+    def clear(self):
+        self.roots = {}
+        self.nodes = 0
+
+    def lookup(self, pit_stop_laps):
+        """Returns the latest saved state along the prefix path of pit_stop_laps, or None."""
+        node = self.roots.get(len(pit_stop_laps))
+        best = None
+        for lap in pit_stop_laps:
+            if node is None:
+                break
+            node = node[0].get(lap)
+            if node is not None and node[1] is not None and (best is None or node[1][0] > best[0]):
+                best = node[1]
+        return best
+
+    def insert(self, pit_stop_laps, depth, state):
+        """Saves `state` for every chromosome that shares the first `depth` pit laps."""
+        if self.nodes + depth > self.max_nodes:
+            # Без LRU по узлам: переполненный trie просто строится заново
+            self.clear()
+            self.resets += 1
+        node = self.roots.get(len(pit_stop_laps))
+        if node is None:
+            node = self.roots[len(pit_stop_laps)] = [{}, None]
+        for lap in pit_stop_laps[:depth]:
+            child = node[0].get(lap)
+            if child is None:
+                child = node[0][lap] = [{}, None]
+                self.nodes += 1
+            node = child
+        if node[1] is None or node[1][0] < state[0]:
+            node[1] = state
+
+    def record(self, start_lap, end_lap):
+        """Counts one evaluation that resumed at start_lap and stopped at end_lap."""
+        self.laps_skipped += start_lap
+        self.laps_simulated += end_lap - start_lap
+        self.resumed += start_lap > 0
+
+    def stats(self):
+        return {
+            'laps_simulated': self.laps_simulated,
+            'laps_skipped': self.laps_skipped,
+            'resumed': self.resumed,
+            'nodes': self.nodes,
+            'resets': self.resets,
+        }
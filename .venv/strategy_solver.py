@@ -0,0 +1,219 @@
+# strategy_solver.py
+import time
+
+import numpy as np
+
+import peremennue
+
+
+class StrategySolver:
+    """Exact dynamic-programming pit-stop solver for the expected race time of RaceModel."""
+
+    def __init__(self, model):
+        self.model = model
+        self.TOTAL_LAPS = model.TOTAL_LAPS
+        self.REQUIRED_PIT_STOPS = model.REQUIRED_PIT_STOPS
+        self.MIN_STINT_LENGTH = model.MIN_STINT_LENGTH
+        self.PIT_STOP_EXTRA_TIME_AVG = model.PIT_STOP_EXTRA_TIME_AVG
+        self.TIME_PENALTY_PER_PERCENT_WEAR = model.TIME_PENALTY_PER_PERCENT_WEAR
+        # Математическое ожидание random.uniform(90, 99)
+        self.EXPECTED_LAP_TIME = (90 + 99) / 2
+
+    def expected_race_time(self, individual, weather=None):
+        """Runs RaceModel._run_simulation with every lap time drawn at its expected value."""
+        saved_weather = self.model.fixed_weather_sequence
+        if weather is not None:
+            self.model.fixed_weather_sequence = list(weather)
+        try:
+            lap_times = np.full(self.TOTAL_LAPS, self.EXPECTED_LAP_TIME)
+            total_time, _, _, _ = self.model._run_simulation(individual, lap_times=lap_times, collect_laps=False)
+        finally:
+            self.model.fixed_weather_sequence = saved_weather
+        return total_time
+
+    def _forecast_tires(self, prefix_counts, start, end):
+        """Tire chosen at a planned pit stop from the forecast weather[start:end] (rule of _run_simulation)."""
+        end = np.maximum(end, start)
+        has_dry, has_light, has_heavy = (prefix_counts[:, end] - prefix_counts[:, start]) > 0
+        codes = peremennue.TIRE_CODES
+        tires = np.where(has_light, codes['Intermediate'], codes['Wet'])
+        tires = np.where(has_dry & ~has_light & ~has_heavy, codes['Soft'], tires)
+        return np.where(has_dry & has_heavy, codes['Wet'], tires)
+
+    def _part_time(self, cum_mismatch, start, tire, laps):
+        """Expected time of `laps` laps on a fresh `tire` fitted at lap index `start` (pit time excluded)."""
+        wear_rate = peremennue.TIRE_WEAR_RATE_TABLE[tire]
+        return (laps * self.EXPECTED_LAP_TIME
+                + self.TIME_PENALTY_PER_PERCENT_WEAR * wear_rate * laps * (laps - 1) / 2
+                + cum_mismatch[tire, start + laps] - cum_mismatch[tire, start])
+
+    def _stint(self, tables, start, tire, emergency_used, end):
+        """Simulates laps start..end-1 on a tire fitted at `start`, ending at the next planned stop `end`.
+
+        Returns (time, dnf_lap, emergency_used_at_end); dnf_lap is TOTAL_LAPS + 1 when the car keeps running.
+        """
+        cum_mismatch, k_emergency, k_dnf_by_tire = tables
+        never = self.TOTAL_LAPS + 1
+        hard = peremennue.TIRE_CODES['Hard']
+
+        length = end - start
+        k_emerg = np.where(emergency_used, never, k_emergency[tire])
+        k_dnf = k_dnf_by_tire[tire]
+        dnf = k_dnf < np.minimum(length, k_emerg)
+        emergency = ~dnf & (k_emerg < length)
+
+        # Первая часть отрезка: до схода, аварийного пит-стопа или следующего планового
+        first_laps = np.where(dnf, k_dnf, np.where(emergency, k_emerg, length))
+        stint_time = self._part_time(cum_mismatch, start, tire, first_laps)
+        dnf_lap = np.where(dnf, start + k_dnf, never)
+
+        # После аварийного пит-стопа едем на Hard до следующего планового
+        emergency_lap = np.where(emergency, start + k_emerg, start)
+        hard_length = end - emergency_lap
+        hard_dnf = emergency & (k_dnf_by_tire[hard] < hard_length)
+        hard_laps = np.where(emergency, np.where(hard_dnf, k_dnf_by_tire[hard], hard_length), 0)
+        stint_time = stint_time + np.where(emergency,
+                                           self.PIT_STOP_EXTRA_TIME_AVG
+                                           + self._part_time(cum_mismatch, emergency_lap, hard, hard_laps),
+                                           0)
+        dnf_lap = np.where(hard_dnf, emergency_lap + k_dnf_by_tire[hard], dnf_lap)
+
+        emergency_at_end = emergency_used | emergency | (k_emerg == length)
+        return stint_time, dnf_lap, emergency_at_end
+
+    def _dnf_cost(self, dnf_lap, planned_stops):
+        return (np.maximum(5000000 - 10000 * dnf_lap, 0)
+                + 15000 * abs(planned_stops - self.REQUIRED_PIT_STOPS))
+
+    def solve(self, weather=None):
+        """Returns (pit_stop_laps, expected_total_time) minimizing the expected race time.
+
+        The state between planned stops is (stop number, lap, emergency stop used); within a stint the
+        tire state depends only on the stint age, so every stint is costed in closed form and the
+        recursion runs over (lap, next pit lap) matrices. Raises ValueError when REQUIRED_PIT_STOPS stops
+        with stints of at least MIN_STINT_LENGTH laps do not fit into TOTAL_LAPS.
+        """
+        if weather is None:
+            weather = self.model.fixed_weather_sequence
+        total_laps = self.TOTAL_LAPS
+        n_stops = self.REQUIRED_PIT_STOPS
+        min_stint = self.MIN_STINT_LENGTH
+        never = total_laps + 1
+        if (n_stops + 1) * min_stint > total_laps:
+            raise ValueError(f"No feasible strategy: {n_stops} pit stops need {n_stops + 1} stints of at least "
+                             f"MIN_STINT_LENGTH={min_stint} laps, but TOTAL_LAPS={total_laps}")
+
+        _, prefix_counts = self.model._encode_weather(weather)
+        weather_codes = np.array([peremennue.WEATHER_CODES[w] for w in weather])
+        mismatch = peremennue.TIRE_MISMATCH_PENALTY_TABLE[weather_codes].T
+        cum_mismatch = np.zeros((len(peremennue.TIRE_TYPES), total_laps + 1))
+        np.cumsum(mismatch, axis=1, out=cum_mismatch[:, 1:])
+        tables = (cum_mismatch,) + self.model._event_ages
+
+        # Без обязательных пит-стопов стратегия одна: вся гонка на стартовых Medium
+        if n_stops == 0:
+            stint_time, dnf_lap, _ = self._stint(tables, np.zeros(1, dtype=int),
+                                                 np.full(1, peremennue.TIRE_CODES['Medium']), False,
+                                                 np.full(1, total_laps))
+            total = np.where(dnf_lap < never, stint_time + self._dnf_cost(dnf_lap, 0), stint_time)
+            return [], float(total[0])
+
+        # Плановый пит-стоп j (1..n) на круге N меняет шины в начале круга с индексом q = N - 1
+        def stop_range(j):
+            first = min_stint - 1 + (j - 1) * min_stint
+            last = total_laps - min_stint - 1 - (n_stops - j) * min_stint
+            return first, last
+
+        laps = np.arange(total_laps)
+        # cost[j][e][q] - оптимальное ожидаемое время от пит-стопа j на круге q до финиша
+        cost = [[None, None] for _ in range(n_stops + 1)]
+        choice = [[None, None] for _ in range(n_stops + 1)]
+
+        for j in range(n_stops, 0, -1):
+            first, last = stop_range(j)
+            for emergency_used in (0, 1):
+                values = np.full(total_laps, np.inf)
+                best_next = np.full(total_laps, -1)
+                q = laps[first:last + 1]
+                if j == n_stops:
+                    end = np.full(len(q), total_laps)
+                    forecast_end = np.where(emergency_used, total_laps, q + 1)
+                    tire = self._forecast_tires(prefix_counts, q, forecast_end)
+                    stint_time, dnf_lap, _ = self._stint(tables, q, tire, bool(emergency_used), end)
+                    total = np.where(dnf_lap < never, stint_time + self._dnf_cost(dnf_lap, j), stint_time)
+                    values[q] = self.PIT_STOP_EXTRA_TIME_AVG + total
+                else:
+                    next_first, next_last = stop_range(j + 1)
+                    q_grid = q[:, None]
+                    next_grid = laps[next_first:next_last + 1][None, :]
+                    valid = next_grid - q_grid >= min_stint
+                    forecast_end = next_grid + 1 if emergency_used else q_grid + 1
+                    tire = self._forecast_tires(prefix_counts, q_grid, forecast_end)
+                    tire = np.broadcast_to(tire, valid.shape)
+                    start = np.broadcast_to(q_grid, valid.shape)
+                    end = np.broadcast_to(next_grid, valid.shape)
+                    stint_time, dnf_lap, emergency_at_end = self._stint(tables, start, tire, bool(emergency_used),
+                                                                        end)
+                    future = np.where(emergency_at_end, cost[j + 1][1][end], cost[j + 1][0][end])
+                    total = np.where(dnf_lap < never, stint_time + self._dnf_cost(dnf_lap, j), stint_time + future)
+                    total = np.where(valid, total, np.inf)
+                    values[q] = self.PIT_STOP_EXTRA_TIME_AVG + total.min(axis=1)
+                    best_next[q] = next_first + total.argmin(axis=1)
+                cost[j][emergency_used] = values
+                choice[j][emergency_used] = best_next
+
+        # Старт: шины Medium, пит-стопа на нулевом круге нет
+        first, last = stop_range(1)
+        next_laps = laps[first:last + 1]
+        start_tire = np.full(len(next_laps), peremennue.TIRE_CODES['Medium'])
+        stint_time, dnf_lap, emergency_at_end = self._stint(tables, np.zeros(len(next_laps), dtype=int), start_tire,
+                                                            False, next_laps)
+        future = np.where(emergency_at_end, cost[1][1][next_laps], cost[1][0][next_laps])
+        total = np.where(dnf_lap < never, stint_time + self._dnf_cost(dnf_lap, 0), stint_time + future)
+
+        # Восстановление оптимальной стратегии
+        q = int(next_laps[total.argmin()])
+        emergency_used = bool(emergency_at_end[total.argmin()])
+        pit_stop_laps = [q + 1]
+        for j in range(1, n_stops):
+            next_q = int(choice[j][emergency_used][q])
+            tire = self._forecast_tires(prefix_counts, np.array(q), np.array(next_q + 1 if emergency_used else q + 1))
+            _, _, emergency_at_end = self._stint(tables, np.array(q), tire, emergency_used, np.array(next_q))
+            q, emergency_used = next_q, bool(emergency_at_end)
+            pit_stop_laps.append(q + 1)
+
+        return pit_stop_laps, float(total.min())
+
+
+def compare_with_ga(random_seed=42, generations=None):
+    """Prints runtime and expected race time of the DP solver against RaceController's GA."""
+    import contextlib
+    import io
+
+    from race_controller import RaceController
+    from race_model import RaceModel
+
+    model = RaceModel(random_seed)
+    solver = StrategySolver(model)
+
+    start = time.perf_counter()
+    dp_strategy, dp_time = solver.solve()
+    dp_runtime = time.perf_counter() - start
+
+    controller = RaceController(model)
+    if generations is not None:
+        controller.MAX_GENERATIONS = generations
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ga_strategy, _ = controller.run_ga_with_elitism()
+    ga_runtime = time.perf_counter() - start
+    ga_time = solver.expected_race_time(ga_strategy)
+
+    print(f"DP: {dp_strategy} - ожидаемое время {dp_time:.2f} сек, расчёт {dp_runtime * 1000:.1f} мс")
+    print(f"GA: {list(ga_strategy)} - ожидаемое время {ga_time:.2f} сек, расчёт {ga_runtime * 1000:.1f} мс")
+    # Знак не обрезается: отрицательное отставание значило бы, что GA нашёл стратегию лучше "оптимума" DP
+    print(f"Отставание GA от оптимума: {ga_time - dp_time:+.2f} сек, ускорение DP: {ga_runtime / dp_runtime:.0f}x")
+
+
+if __name__ == "__main__":
+    compare_with_ga()
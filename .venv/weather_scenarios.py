@@ -0,0 +1,53 @@
+# weather_scenarios.py
+import hashlib
+import math
+
+import numpy as np
+
+import peremennue
+
+RISK_MEASURES = ('mean', 'percentile', 'cvar')
+
+
+class WeatherScenarios:
+    """A fixed set of weather sequences and lap-time draws shared by every strategy (common random numbers)."""
+
+    def __init__(self, weather, lap_times):
+        self.weather = np.asarray(weather, dtype=np.int8)
+        self.lap_times = np.asarray(lap_times, dtype=float)
+
+        # Префиксные суммы сухих / лёгкий дождь / средний-сильный дождь кругов для выбора шин по прогнозу
+        codes = peremennue.WEATHER_CODES
+        categories = np.stack([
+            self.weather == codes['dry'],
+            self.weather == codes['light_rain'],
+            self.weather >= codes['medium_rain'],
+        ], axis=1)
+        self.prefix_counts = np.zeros(categories.shape[:2] + (categories.shape[2] + 1,), dtype=np.int16)
+        np.cumsum(categories, axis=2, out=self.prefix_counts[:, :, 1:])
+
+        digest = hashlib.sha1(self.weather.tobytes())
+        digest.update(self.lap_times.tobytes())
+        self.key = digest.hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.weather)
+
+    def weather_names(self, index):
+        """Returns scenario `index` as a list of weather names, like RaceModel.fixed_weather_sequence."""
+        return [peremennue.WEATHER_TYPES[code] for code in self.weather[index]]
+
+
+def risk_measure(times, risk='mean', alpha=0.9):
+    """Aggregates race times of shape (scenarios, strategies) into one robust fitness per strategy.
+
+    `percentile` is the alpha-quantile, `cvar` the mean of the worst (1 - alpha) share of scenarios.
+    """
+    if risk == 'mean':
+        return times.mean(axis=0)
+    if risk == 'percentile':
+        return np.percentile(times, alpha * 100, axis=0)
+    if risk == 'cvar':
+        tail = max(1, math.ceil((1 - alpha) * len(times)))
+        return np.sort(times, axis=0)[-tail:].mean(axis=0)
+    raise ValueError(f"Unknown risk measure {risk!r}, expected one of {RISK_MEASURES}")